@@ -6,13 +6,32 @@ import pandas as pd
 
 from SecurityClasses import SecurityUniverse
 from PlatformClasses import platformCode_to_class
+from Dates import format_day
+from LookThrough import SectorLookThrough
+from PositionTable import PositionTable
+from Money import to_pounds
+from AccountSummary import account_summary, combine_summaries
+from Dividends import DividendEvent, EVENT_DAY, merge_events
 
 from wb import WbIncome, WS_POSITION_INCOME
 
+# Asset types used by AccountGroup.asset_value and their asset classes
+ASSET_TYPES = {
+    'EQUITY': 'equity',
+    'BOND': 'bond',
+    'INFRASTRUCTURE': 'infrastructure',
+    'PROPERTY': 'property',
+    'COMMODITY': 'commodities',
+    'CASH': 'cash'
+}
+
 
 class Account:
     def __init__(self, secu, username, defn):
         self._positions = []
+        self._table = None
+        self._rows = None
+        self._summary = None
         self._aa = {}
         self._defn = defn
         self._username = username
@@ -48,6 +67,7 @@ class Account:
     def add_position(self, pos):
         # logging.debug("add_position(%s)", pos)
         self._positions.append(pos)
+        self._summary = None
 
     def account_type(self, fullname=False):
         names = {
@@ -58,125 +78,127 @@ class Account:
         }
         return names[self._account_type] if fullname and self._account_type in names.keys() else self._account_type
 
+    # PositionTable holding this account's positions as the given slice of rows
+    def set_position_table(self, table, rows):
+        self._table = table
+        self._rows = rows
+        self._summary = None
+
+    # Same positions at new rows of the table; totals are unchanged
+    def move_position_rows(self, rows):
+        self._rows = rows
+
+    def position_table(self):
+        if self._table is None:
+            PositionTable([self])
+        return self._table
+
+    def position_rows(self):
+        return self._rows
+
+    # All totals of the account, computed together and kept until its
+    # positions or their securities change
+    def summary(self):
+        if self._summary is None:
+            table = self.position_table()
+            self._summary = account_summary(table, self._rows, self._positions)
+        return self._summary
+
+    def clear_summary(self):
+        self._summary = None
+
     def annual_income(self):
-        total = 0.0
+        return self.summary().annual_income()
+
+    # Payments or declarations of every position as an iterator of
+    # DividendEvent in day order (latest first if reverse), positions in
+    # account order on the same day
+    def dividend_events(self, info='PAYMENTS', reverse=False):
+        events = []
         for pos in self._positions:
-            # print("INCOME pos=%s" % (pos))
-            total += pos.annual_income()
-        return total
+            if info == 'PAYMENTS':
+                dp = pos.dividend_payments()
+            elif info == 'DECLARATIONS':
+                dp = pos.dividend_declarations()
+            else:
+                dp = {}
+                assert False, "Unknown dividend info (%s)"%(info)
+            events.extend(DividendEvent(dt, amount, pos) for dt, amount in dp.items())
+        events.sort(key=EVENT_DAY, reverse=reverse)
+        return iter(events)
 
+    # Payments and declarations are keyed by day number
     def dividend_payments(self):
-        payments = {}
-        for pos in self._positions:
-            dp = pos.dividend_payments()
-            if dp:
-                for dt in dp.keys():
-                    if dt not in payments.keys():
-                        payments[dt] = []
-                    payments[dt].append({'username': self.username(), 'acctype': self.account_type(True), 'platform': self.platform(True),
-                                         'secid': pos.sname(), 'secname': pos.lname(), 'amount': dp[dt]})
-        return payments
+        return event_details(self.dividend_events('PAYMENTS'))
 
     def dividend_declarations(self):
-        payments = {}
-        for pos in self._positions:
-            dp = pos.dividend_declarations()
-            if dp:
-                for dt in dp.keys():
-                    if dt not in payments.keys():
-                        payments[dt] = []
-                    payments[dt].append({'username': self.username(), 'acctype': self.account_type(True), 'platform': self.platform(True),
-                                         'secid': pos.sname(), 'secname': pos.lname(), 'amount': dp[dt]})
-        return payments
+        return event_details(self.dividend_events('DECLARATIONS'))
 
     def value(self):
-        total = 0.0
-        for pos in self._positions:
-            total += pos.value()
-        return total
+        return self.summary().value()
+
+    def value_pence(self):
+        return self.summary().value_pence()
 
     def vdate(self):
         return self._vdate
 
+    # Definition the account was loaded from
+    def defn(self):
+        return self._defn
+
+    # Value in each asset class from the sector allocation matrix
+    def asset_class_values(self):
+        return self.summary().asset_class_values()
+
     def equity_value(self):
-        total = 0.0
-        for pos in self._positions:
-            total += pos.equity_value()
-        return total
+        return self.asset_class_values()['equity']
 
     def bond_value(self):
-        total = 0.0
-        for pos in self._positions:
-            total += pos.bond_value()
-        return total
+        return self.asset_class_values()['bond']
 
     def infrastructure_value(self):
-        total = 0.0
-        for pos in self._positions:
-            total += pos.infrastructure_value()
-        return total
+        return self.asset_class_values()['infrastructure']
 
     def property_value(self):
-        total = 0.0
-        for pos in self._positions:
-            total += pos.property_value()
-        return total
+        return self.asset_class_values()['property']
 
     def commodity_value(self):
-        total = 0.0
-        for pos in self._positions:
-            total += pos.commodity_value()
-        return total
+        return self.asset_class_values()['commodities']
 
     def cash_value(self):
-        total = 0.0
-        for pos in self._positions:
-            total += pos.cash_value()
-        return total
+        return self.asset_class_values()['cash']
 
     def asset_breakdown(self):
-        brk = {}
-        for pos in self._positions:
-            b = pos.asset_breakdown()
-            for k in b.keys():
-                if k not in brk.keys():
-                    brk[k] = 0.0
-                brk[k] += b[k]
-
-        return brk
+        return self.summary().asset_breakdown()
 
     def region_breakdown(self):
-        brk = {}
-        for pos in self._positions:
-            b = pos.region_breakdown()
-            for k in b.keys():
-                if k not in brk.keys():
-                    brk[k] = 0.0
-                brk[k] += b[k]
+        return self.summary().region_breakdown()
 
-        return brk
+    # Sector and parent sector totals
+    def sector_rollup(self):
+        return self.summary().sector_rollup()
 
     def sector_breakdown(self):
-        brk = {}
-        for pos in self._positions:
-            sector = pos.sector()
-            amount = pos.sector_amount()
-            if sector not in brk.keys():
-                brk[sector] = 0.0
-            brk[sector] += amount
-
-        return brk
+        return self.sector_rollup()[0]
 
     def parent_sector_breakdown(self):
-        brk = {}
-        for pos in self._positions:
-            sector = pos.parent_sector()
-            amount = pos.sector_amount()
-            if sector not in brk.keys():
-                brk[sector] = 0.0
-            brk[sector] += amount
+        return self.sector_rollup()[1]
+
+    # Sector breakdown looking through funds to their underlying sectors
+    def lookthrough_sector_breakdown(self):
+        return SectorLookThrough(self._positions).breakdown()
+
 
-        return brk
+# Dict of day number to the details of each event on that day
+def event_details(events):
+    details = {}
+    for ev in events:
+        pos = ev.position
+        account = pos.account()
+        details.setdefault(ev.day, []).append({'username': account.username(), 'acctype': account.account_type(True), 'platform': account.platform(True),
+                                               'secid': pos.sname(), 'secname': pos.lname(), 'amount': ev.amount})
+    return details
 
 
 # ===================================================================================
@@ -187,8 +209,14 @@ class Account:
 class AccountGroup():
     def __init__(self, accounts, account_type=None, platform_name=None):
         logging.debug("AccountGroup(%s,%s)" % (account_type, platform_name))
-        self._accounts = []
+        self._positions = None
+
+        # An unfiltered list is used as is, not copied
+        if account_type is None and platform_name is None and isinstance(accounts, list):
+            self._accounts = accounts
+            return
 
+        self._accounts = []
         for acct in accounts:
             if account_type is None or acct.account_type() in account_type:
                 if platform_name is None or acct.platform() == platform_name:
@@ -197,63 +225,46 @@ class AccountGroup():
     def accounts(self):
         return self._accounts
 
+    # Gathered once; the list is shared so must not be modified
     def positions(self):
-        poslist = []
-        for account in self.accounts():
-            for pos in account.positions():
-                poslist.append(pos)
-        return poslist
+        if self._positions is None:
+            self._positions = []
+            for account in self.accounts():
+                self._positions.extend(account.positions())
+        return self._positions
+
+    # Accounts' cached summaries combined
+    def summary(self):
+        return combine_summaries(acct.summary() for acct in self._accounts)
 
     # ====== Assets ======
 
+    def asset_class_values(self):
+        return self.summary().asset_class_values()
+
+    def value_pence(self):
+        return self.summary().value_pence()
+
     def asset_value(self, asset_type):
-        total = 0.0
-        for account in self.accounts():
-            if asset_type == 'ALL':
-                total += account.value()
-            elif asset_type == 'EQUITY':
-                total += account.equity_value()
-            elif asset_type == 'BOND':
-                total += account.bond_value()
-            elif asset_type == 'INFRASTRUCTURE':
-                total += account.infrastructure_value()
-            elif asset_type == 'PROPERTY':
-                total += account.property_value()
-            elif asset_type == 'COMMODITY':
-                total += account.commodity_value()
-            elif asset_type == 'CASH':
-                total += account.cash_value()
-            else:
-                assert True, "Unknown asset type (%s)" % asset_type
+        if asset_type == 'ALL':
+            return to_pounds(self.value_pence())
 
-        return total
+        if asset_type not in ASSET_TYPES.keys():
+            assert True, "Unknown asset type (%s)" % asset_type
+            return 0.0
+        return self.asset_class_values()[ASSET_TYPES[asset_type]]
 
     # ====== Income ======
 
     def annual_income(self):
-        total = 0.0
-        for account in self.accounts():
-            total += account.annual_income()
-        return total
+        return self.summary().annual_income()
 
-    def dividend_info(self, info):
-        payments = {}
-        for account in self.accounts():
-            if info == 'PAYMENTS':
-                dp = account.dividend_payments()
-            elif info == 'DECLARATIONS':
-                dp = account.dividend_declarations()
-            else:
-                dp = None
-                assert True, "Unknown dividend info (%s)"%(info)
+    # Events of all accounts merged into one stream in day order
+    def dividend_events(self, info='PAYMENTS', reverse=False):
+        return merge_events([account.dividend_events(info, reverse) for account in self.accounts()], reverse)
 
-            if dp:
-                for dt in dp.keys():
-                    if dt not in payments.keys():
-                        payments[dt] = []
-                    for a in dp[dt]:
-                        payments[dt].append(a)
-        return payments
+    def dividend_info(self, info):
+        return event_details(self.dividend_events(info))
 
     def dividend_payments(self):
         return self.dividend_info('PAYMENTS')
@@ -264,44 +275,99 @@ class AccountGroup():
     # ====== Breakdown ======
 
     def asset_breakdown(self):
-        brk = {}
-        for account in self.accounts():
-            b = account.asset_breakdown()
-            for k in b.keys():
-                if k not in brk.keys():
-                    brk[k] = 0.0
-                brk[k] += b[k]
-        return brk
+        return self.summary().asset_breakdown()
 
     def region_breakdown(self):
-        brk = {}
-        for account in self.accounts():
-            b = account.region_breakdown()
-            for k in b.keys():
-                if k not in brk.keys():
-                    brk[k] = 0.0
-                brk[k] += b[k]
-        return brk
+        return self.summary().region_breakdown()
+
+    def sector_rollup(self):
+        return self.summary().sector_rollup()
 
     def sector_breakdown(self):
-        brk = {}
-        for account in self.accounts():
-            b = account.sector_breakdown()
-            for k in b.keys():
-                if k not in brk.keys():
-                    brk[k] = 0.0
-                brk[k] += b[k]
-        return brk
+        return self.sector_rollup()[0]
+
+    def lookthrough_sector_breakdown(self):
+        return SectorLookThrough(self.positions()).breakdown()
 
     def parent_sector_breakdown(self):
-        brk = {}
-        for account in self.accounts():
-            b = account.parent_sector_breakdown()
-            for k in b.keys():
-                if k not in brk.keys():
-                    brk[k] = 0.0
-                brk[k] += b[k]
-        return brk
+        return self.sector_rollup()[1]
+
+
+# (user, account type, platform) of an account
+def account_key(acct):
+    return (acct.username(), acct.account_type(), acct.platform())
+
+
+# Hashable (user, account_type, platform_name) filter; None matches anything
+# and account_type matches by 'in' as in AccountGroup
+def filter_key(user=None, account_type=None, platform_name=None):
+    return (user, tuple(account_type) if isinstance(account_type, list) else account_type, platform_name)
+
+
+def filter_match(key, account_key):
+    user, account_type, platform_name = key
+    u, t, p = account_key
+    return (user is None or u == user) and (account_type is None or t in account_type) and (platform_name is None or p == platform_name)
+
+
+# ===================================================================================
+# Accounts indexed by (user, account type, platform). Each distinct filter
+# gets one AccountGroup, built from the matching index buckets and kept until
+# accounts are added, so repeated queries share its account and position lists.
+# ===================================================================================
+
+class AccountIndex():
+    def __init__(self, accounts=()):
+        self._accounts = []
+        self._order = {}
+        self._buckets = {}
+        self._groups = {}
+        for acct in accounts:
+            self.add_account(acct)
+
+    def add_account(self, acct):
+        self._order[id(acct)] = len(self._accounts)
+        self._accounts.append(acct)
+        self._buckets.setdefault(account_key(acct), []).append(acct)
+        self._groups = {}
+
+    # Put a reloaded account in place of old, forgetting only the groups
+    # whose filter covers either of them
+    def replace_account(self, old, new):
+        n = self._order.pop(id(old))
+        self._order[id(new)] = n
+        self._accounts[n] = new
+        bucket = self._buckets[account_key(old)]
+        bucket.remove(old)
+        if not bucket:
+            del self._buckets[account_key(old)]
+        bucket = self._buckets.setdefault(account_key(new), [])
+        bucket.append(new)
+        bucket.sort(key=lambda acct: self._order[id(acct)])
+        for key in [key for key in self._groups.keys() if filter_match(key, account_key(old)) or filter_match(key, account_key(new))]:
+            del self._groups[key]
+
+    def group(self, user=None, account_type=None, platform_name=None):
+        key = filter_key(user, account_type, platform_name)
+        grp = self._groups.get(key)
+        if grp is None:
+            if key == (None, None, None):
+                accounts = list(self._accounts)
+            else:
+                accounts = []
+                for cell, bucket in self._buckets.items():
+                    if filter_match(key, cell):
+                        accounts.extend(bucket)
+                accounts.sort(key=lambda acct: self._order[id(acct)])
+            grp = AccountGroup(accounts)
+            self._groups[key] = grp
+        return grp
+
+    def accounts(self, user=None, account_type=None, platform_name=None):
+        return self.group(user, account_type, platform_name).accounts()
+
+    def positions(self, user=None, account_type=None, platform_name=None):
+        return self.group(user, account_type, platform_name).positions()
 
 
 if __name__ == '__main__':
@@ -341,7 +407,7 @@ if __name__ == '__main__':
             'Quantity':     pos.quantity(),
             'BookCost':     pos.cost(),
             'Value':        pos.value(),
-            'ValueDate':    pos.vdate()
+            'ValueDate':    format_day(pos.vdate())
             }
         print(p)
         pos_list.append(p)
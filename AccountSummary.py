@@ -0,0 +1,95 @@
+# Every account metric computed together so dashboards do not walk the
+# positions once per metric
+
+import logging
+import numpy as np
+
+from Breakdown import ASSET_CLASSES, ASSET_INDEX, REGION_INDEX, vector_sums, named_totals, first_appearance
+from Money import to_pounds
+
+
+# Pad totals to the current size of a CategoryIndex, which may have grown
+# since they were computed
+def pad_sums(sums, size):
+    totals, order = sums
+    if len(totals) < size:
+        totals = np.concatenate((totals, np.zeros(size - len(totals))))
+    return totals, order
+
+
+# Totals and order of several vector_sums, names in order of first appearance
+def combine_sums(sums, size):
+    sums = [pad_sums(s, size) for s in sums]
+    order = np.array(first_appearance(np.concatenate([s[1] for s in sums])), dtype=np.intp)
+    return np.sum([s[0] for s in sums], axis=0), order
+
+
+# Sum dicts of totals, keys in order of first appearance
+def merge_totals(dicts):
+    merged = {}
+    for d in dicts:
+        for k, v in d.items():
+            merged[k] = merged.get(k, 0.0) + v
+    return merged
+
+
+# Value, income, asset class, asset, region, sector and parent sector totals
+# of one account in a single vectorised pass over its PositionTable rows, or
+# the combination of several such summaries.
+class AccountSummary():
+    def __init__(self, value_pence=0, annual_income=0.0, asset_classes=None, assets=None, regions=None, sectors=None, parents=None):
+        self._value_pence = value_pence
+        self._annual_income = annual_income
+        self._asset_classes = np.zeros(len(ASSET_CLASSES)) if asset_classes is None else asset_classes
+        self._assets = pad_sums(assets or (np.zeros(0), np.empty(0, dtype=np.intp)), len(ASSET_INDEX))
+        self._regions = pad_sums(regions or (np.zeros(0), np.empty(0, dtype=np.intp)), len(REGION_INDEX))
+        self._sectors = sectors or {}
+        self._parents = parents or {}
+
+    def value_pence(self):
+        return self._value_pence
+
+    def value(self):
+        return to_pounds(self._value_pence)
+
+    def annual_income(self):
+        return self._annual_income
+
+    def asset_class_values(self):
+        return dict(zip(ASSET_CLASSES, self._asset_classes.tolist()))
+
+    def asset_breakdown(self):
+        return named_totals(ASSET_INDEX, *self._assets)
+
+    def region_breakdown(self):
+        return named_totals(REGION_INDEX, *self._regions)
+
+    def sector_rollup(self):
+        return dict(self._sectors), dict(self._parents)
+
+
+# Summary of an account's positions, which must be attached to table as rows
+def account_summary(table, rows, positions):
+    sectors, parents = table.sector_rollup(rows)
+    summary = AccountSummary(table.value_pence(rows),
+                             table.annual_income(rows),
+                             table.asset_class_amounts(rows),
+                             vector_sums(ASSET_INDEX, [pos.asset_vector() for pos in positions]),
+                             vector_sums(REGION_INDEX, [pos.region_vector() for pos in positions]),
+                             sectors, parents)
+    logging.debug("account_summary positions=%d" % len(positions))
+    return summary
+
+
+# One summary totalling several, without going back to their positions
+def combine_summaries(summaries):
+    summaries = list(summaries)
+    if not summaries:
+        return AccountSummary()
+    return AccountSummary(sum(s._value_pence for s in summaries),
+                          sum(s._annual_income for s in summaries),
+                          np.sum([s._asset_classes for s in summaries], axis=0),
+                          combine_sums([s._assets for s in summaries], len(ASSET_INDEX)),
+                          combine_sums([s._regions for s in summaries], len(REGION_INDEX)),
+                          merge_totals(s._sectors for s in summaries),
+                          merge_totals(s._parents for s in summaries))
@@ -2,254 +2,556 @@ import os
 import re
 import json
 import logging
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 
 # ASSET CLASS BREAKDOWN (DD/MM/YYYY)
 # REGION BREAKDOWN (DD/MM/YYYY)
+# SECTOR BREAKDOWN (DD/MM/YYYY)
 
+def breakdown_dirname():
+    return os.getenv('HOME') + '/SecurityInfo/Breakdown'
+
+def breakdown_filename(name):
+    return breakdown_dirname() + '/' + name
+
+
+class BreakdownError(ValueError):
+    def __init__(self, path, lineno, line):
+        self.path = path
+        self.lineno = lineno
+        self.line = line
+        ValueError.__init__(self, "Breakdown %s line %d: %r" % (path, lineno, line))
+
+    def __reduce__(self):
+        return (BreakdownError, (self.path, self.lineno, self.line))
+
+
+TAB_SPLIT = re.compile(r'\t+')
+
+# Parse a breakdown file into lists of asset, region and sector entries
+def read_breakdown(full_path):
+    assets = []
+    regions = []
+    sectors = []
+    section = None
+    with open(full_path, 'r', encoding='utf-8-sig') as fp:
+        for lineno, line in enumerate(fp, 1):
+            if 'ASSET CLASS BREAKDOWN' in line:
+                section = assets
+                continue
+            if 'REGION BREAKDOWN' in line:
+                section = regions
+                continue
+            if 'SECTOR BREAKDOWN' in line:
+                section = sectors
+                continue
+            if section is None or not line.strip():
+                continue
+            a = TAB_SPLIT.split(line.rstrip())
+            if a[0] == 'Rank':
+                continue
+            try:
+                section.append((int(a[0]), a[1], float(a[2])))
+            except (ValueError, IndexError):
+                # A bad sector row loses only that row, not the asset and region data
+                if section is not sectors:
+                    raise BreakdownError(full_path, lineno, line.rstrip())
+                logging.warning("%s (skipped)" % (BreakdownError(full_path, lineno, line.rstrip())))
+    return Breakdown(assets, regions, sectors)
+
+
+# Names of the asset classes or regions found in breakdown files, each given
+# a fixed id the first time it is seen so breakdowns can be held as vectors
+class CategoryIndex():
+    def __init__(self):
+        self._names = []
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def id(self, name):
+        try:
+            return self._ids[name]
+        except KeyError:
+            with self._lock:
+                if name not in self._ids:
+                    self._ids[name] = len(self._names)
+                    self._names.append(name)
+                return self._ids[name]
+
+    def ids(self, names):
+        return np.array([self.id(name) for name in names], dtype=np.intp)
+
+    def names(self):
+        return self._names
+
+    def __len__(self):
+        return len(self._names)
+
+ASSET_INDEX = CategoryIndex()
+REGION_INDEX = CategoryIndex()
+
+
+# Sum of (ids, amounts) vectors as a dict keyed by name, holding every name
+# present in at least one of the vectors in order of first appearance
+def vector_totals(index, vectors):
+    return named_totals(index, *vector_sums(index, vectors))
+
+
+# Sum of (ids, amounts) vectors as an array of totals and the ids present in
+# order of first appearance
+def vector_sums(index, vectors):
+    if not vectors:
+        return np.zeros(len(index)), np.empty(0, dtype=np.intp)
+    ids = np.concatenate([v[0] for v in vectors])
+    amounts = np.concatenate([v[1] for v in vectors])
+    totals = np.bincount(ids, amounts, minlength=len(index))
+    return totals, np.array(first_appearance(ids), dtype=np.intp)
+
+
+def named_totals(index, totals, order):
+    names = index.names()
+    return {names[i]: totals[i].item() for i in order.tolist()}
+
+
+# Parsed breakdown of a security. Instances are shared between securities
+# by the BreakdownStore so must be treated as read-only.
 class Breakdown():
-    def __init__(self,name):
-        self._rootdir = os.getenv('HOME') + '/SecurityInfo/Breakdown'
-        self._assets = []
-        self._regions = []
-        full_path = self._rootdir + '/' + name
-        in_assets = False
-        in_region = False
-        if os.path.isfile(full_path):
-            with open(full_path, 'r', encoding='utf-8-sig') as fp:
-                try:
-                    for line in fp:
-                        if 'ASSET CLASS BREAKDOWN' in line:
-                            in_assets = True
-                            in_region = False
-                            continue
-                        if 'REGION BREAKDOWN' in line:
-                            in_assets = False
-                            in_region = True
-                            continue
-                        if 'SECTOR BREAKDOWN' in line:
-                            in_assets = False
-                            in_region = False
-                            continue
-                        if in_assets or in_region:
-                            a = re.split(r'\t+', line.rstrip())
-                            # print(a)
-                            if a[0] == 'Rank':
-                                continue
-                            if in_assets:
-                                self._assets.append({'rank':int(a[0]), 'asset':a[1], 'percent':float(a[2])})
-                            if in_region:
-                                self._regions.append({'rank':int(a[0]), 'region':a[1], 'percent':float(a[2])})
-                except:
-                    print("ERROR:%s" % (full_path))
-                    exit(1)
+    __slots__ = ('_assets', '_regions', '_sectors', '_asset_brk', '_region_brk', '_sector_brk', '_asset_vec', '_region_vec')
+
+    def __init__(self, assets=(), regions=(), sectors=()):
+        self._assets = [{'rank': r, 'asset': n, 'percent': p} for r, n, p in assets]
+        self._regions = [{'rank': r, 'region': n, 'percent': p} for r, n, p in regions]
+        self._sectors = [{'rank': r, 'sector': n, 'percent': p} for r, n, p in sectors]
+        self._asset_brk = {n: p for r, n, p in assets}
+        self._region_brk = {n: p for r, n, p in regions}
+        self._sector_brk = {n: p for r, n, p in sectors}
+        self._asset_vec = (ASSET_INDEX.ids(self._asset_brk.keys()), np.array(list(self._asset_brk.values()), dtype=float))
+        self._region_vec = (REGION_INDEX.ids(self._region_brk.keys()), np.array(list(self._region_brk.values()), dtype=float))
 
     def asset_breakdown(self):
-        brk = {}
-        for a in self._assets:
-            brk[a['asset']] = a['percent']
-        return brk
+        return self._asset_brk
 
     def region_breakdown(self):
-        brk = {}
-        for a in self._regions:
-            brk[a['region']] = a['percent']
-        return brk
+        return self._region_brk
+
+    def sector_breakdown(self):
+        return self._sector_brk
+
+    # Percentages as (ASSET_INDEX ids, percents)
+    def asset_vector(self):
+        return self._asset_vec
+
+    # Percentages as (REGION_INDEX ids, percents)
+    def region_vector(self):
+        return self._region_vec
 
     def __repr__(self):
-        str = "regions=%s\nassets=%s" % (json.dumps(self._regions), json.dumps(self._assets))
+        str = "regions=%s\nassets=%s\nsectors=%s" % (json.dumps(self._regions), json.dumps(self._assets), json.dumps(self._sectors))
         return str
 
+    # Pickled as its entries; the vectors are rebuilt on load because
+    # CategoryIndex ids are only fixed within one process
+    def __reduce__(self):
+        return (Breakdown, ([(e['rank'], e['asset'], e['percent']) for e in self._assets],
+                            [(e['rank'], e['region'], e['percent']) for e in self._regions],
+                            [(e['rank'], e['sector'], e['percent']) for e in self._sectors]))
+
+
+# Shared by every security without a breakdown file
+EMPTY_BREAKDOWN = Breakdown()
+
+
+# Every breakdown file, read once and re-parsed only when its size or
+# modification time changes. Files that fail to parse are logged and
+# treated as empty; the errors are kept for reporting.
+class BreakdownStore():
+    def __init__(self, dirname=None):
+        self._dirname = breakdown_dirname() if dirname is None else dirname
+        self._sigs = {}
+        self._breakdowns = {}
+        self._errors = {}
+
+    def dirname(self):
+        return self._dirname
+
+    # Parsed files, signatures and errors, to be saved and passed to restore()
+    # so a later run only parses files that have changed since
+    def state(self):
+        return {'dirname': self._dirname, 'sigs': self._sigs, 'breakdowns': self._breakdowns, 'errors': self._errors}
+
+    def restore(self, state):
+        if state and state['dirname'] == self._dirname:
+            self._sigs = dict(state['sigs'])
+            self._breakdowns = dict(state['breakdowns'])
+            self._errors = dict(state['errors'])
+
+    # Signatures of breakdown files keyed by security name
+    def scan(self):
+        sigs = {}
+        if os.path.isdir(self._dirname):
+            with os.scandir(self._dirname) as it:
+                for entry in it:
+                    if entry.is_file():
+                        st = entry.stat()
+                        sigs[entry.name] = (st.st_size, st.st_mtime_ns)
+        return sigs
+
+    # Re-scan the directory, parsing new and changed files (optionally using a
+    # pool of worker threads). Returns the set of names added, changed or removed.
+    def refresh(self, workers=None):
+        sigs = self.scan()
+        changed = [name for name, sig in sigs.items() if self._sigs.get(name) != sig]
+        removed = [name for name in self._sigs.keys() if name not in sigs]
+
+        paths = [self._dirname + '/' + name for name in changed]
+        if workers is None or workers <= 1:
+            parsed = [self.parse(full_path) for full_path in paths]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                parsed = list(pool.map(self.parse, paths))
+
+        for name in removed:
+            self._breakdowns.pop(name, None)
+            self._errors.pop(name, None)
+        for name, (brk, error) in zip(changed, parsed):
+            self._breakdowns[name] = brk
+            if error is None:
+                self._errors.pop(name, None)
+            else:
+                self._errors[name] = error
+
+        self._sigs = sigs
+        logging.debug("BreakdownStore.refresh() changed=%d removed=%d" % (len(changed), len(removed)))
+        return set(changed) | set(removed)
+
+    def parse(self, full_path):
+        try:
+            return read_breakdown(full_path), None
+        except (BreakdownError, OSError, UnicodeDecodeError) as e:
+            logging.error("%s" % (e))
+            return EMPTY_BREAKDOWN, e
+
+    def signatures(self):
+        return self._sigs
+
+    def signature(self, name):
+        return self._sigs.get(name)
+
+    # Shared breakdown for the security, empty if it has no file
+    def breakdown(self, name):
+        return self._breakdowns.get(name, EMPTY_BREAKDOWN)
+
+    def errors(self):
+        return self._errors
+
+    def __len__(self):
+        return len(self._breakdowns)
+
+
+# Asset classes in the order used by allocation rows
+ASSET_CLASSES = ['equity', 'bond', 'infrastructure', 'property', 'commodities', 'cash']
+
+# Percentage of each asset class held by funds in a sector
+SECTOR_ASSET_SPLITS = {
+    "Asia Pacific Ex Japan": 
+        { "equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
+    "Asia Pacific Income": 
+        { "equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
+    "Asia Pacific Smaller Companies": 
+        { "equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
+    "Banks": 
+        { "equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
+    "Cash": 
+        { "equity": 0.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 100.0 },
+    "Commodities & Natural Resources": 
+        { "equity": 0.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 100.0, "cash": 0.0 },
+    "Debt - Loans & Bonds":
+        {"equity": 0.0, "bond": 100.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0},
+    "Europe":
+        {"equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0},
+    "Financials": 
+        { "equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
+    "Flexible Investment":
+        { "equity": 40.0, "bond": 40.0, "infrastructure": 0.0, "property": 10.0, "commodities": 5.0, "cash": 5.0},
+    "GBP Strategic Bond":
+        { "equity": 0.0, "bond": 100.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
+    "Gbl ETF Equity - Europe ex UK":
+        {"equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0},
+    "Global": 
+        { "equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
+    "Global Bonds": 
+        { "equity": 0.0, "bond": 100.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
+    "Global Equities": 
+        { "equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
+    "Global Equity Income": 
+        { "equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
+    "Global Property": 
+        { "equity": 0.0, "bond": 0.0, "infrastructure": 0.0, "property": 100.0, "commodities": 0.0, "cash": 0.0 },
+    "Global Smaller Companies":
+        {"equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0},
+    "Infrastructure":
+        {"equity": 0.0, "bond": 0.0, "infrastructure": 100.0, "property": 0.0, "commodities": 0.0, "cash": 0.0},
+    "Japanese Smaller Companies":
+        {"equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0},
+    "Latin America":
+        { "equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
+    "Mixed Investment 0-35% Shares": 
+        { "equity": 20.0, "bond": 80.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
+    "Mixed Investment 20-60% Shares": 
+        { "equity": 40.0, "bond": 60.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
+    "Mixed Investment 40-85% Shares": 
+        { "equity": 62.5, "bond": 37.5, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
+    "Property": 
+        { "equity": 0.0, "bond": 0.0, "infrastructure": 0.0, "property": 100.0, "commodities": 0.0, "cash": 0.0 },
+    "Property Securities": 
+        { "equity": 0.0, "bond": 0.0, "infrastructure": 0.0, "property": 100.0, "commodities": 0.0, "cash": 0.0 },
+    "Property - UK Commercial": 
+        { "equity": 0.0, "bond": 0.0, "infrastructure": 0.0, "property": 100.0, "commodities": 0.0, "cash": 0.0 },
+    "Real Estate Investment Trusts":
+        { "equity": 0.0, "bond": 0.0, "infrastructure": 0.0, "property": 100.0, "commodities": 0.0, "cash": 0.0},
+    "Short Term Money Market": 
+        { "equity": 0.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 100.0 },
+    "Specialist": 
+        { "equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
+    "Technology & Telecommunications": 
+        { "equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
+    "UK All Companies": 
+        { "equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
+    "UK Equity Income": 
+        { "equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
+    "UK Smaller Companies": 
+        { "equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
+    "USD Index Linked": 
+        { "equity": 0.0, "bond": 100.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
+    "With Profits":
+        # {"equity": 40.0, "bond": 45.0, "infrastructure": 0.0, "property": 15.0, "commodities": 0.0, "cash": 0.0},
+        {"equity": 0.0, "bond": 100.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0},
+}
+
+SECTOR_INDEX = {sector: n for n, sector in enumerate(SECTOR_ASSET_SPLITS.keys())}
+SECTOR_ASSET_MATRIX = np.array([[split[ac] for ac in ASSET_CLASSES] for split in SECTOR_ASSET_SPLITS.values()])
+
+
+# Asset class percentages for a sector, or from a security's own override
+def allocation_row(sector, override=None):
+    if override is not None:
+        logging.debug("AssetAllocation override=%s"%(override))
+        return np.array([override[ac] for ac in ASSET_CLASSES], dtype=float)
+    if sector not in SECTOR_INDEX:
+        assert False, "ERROR: AssetAllocation(%s) - sector not defined" % (sector)
+    return SECTOR_ASSET_MATRIX[SECTOR_INDEX[sector]]
+
+
+# Value in each asset class of a set of positions as one matrix-vector
+# product of position values and their allocation rows (percentages)
+def asset_class_amounts(values, rows):
+    rows = np.asarray(rows, dtype=float).reshape(-1, len(ASSET_CLASSES))
+    return np.asarray(values, dtype=float) @ rows / 100.0
+
+
+def asset_class_totals(values, rows):
+    return dict(zip(ASSET_CLASSES, asset_class_amounts(values, rows).tolist()))
+
 
 class AssetAllocation:
+    __slots__ = ('_amounts',)
+
     def __init__(self, sector, amount, override=None):
-        splits = {
-            "Asia Pacific Ex Japan": 
-                { "equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
-            "Asia Pacific Income": 
-                { "equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
-            "Asia Pacific Smaller Companies": 
-                { "equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
-            "Banks": 
-                { "equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
-            "Cash": 
-                { "equity": 0.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 100.0 },
-            "Commodities & Natural Resources": 
-                { "equity": 0.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 100.0, "cash": 0.0 },
-            "Debt - Loans & Bonds":
-                {"equity": 0.0, "bond": 100.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0},
-            "Europe":
-                {"equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0},
-            "Financials": 
-                { "equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
-            "Flexible Investment":
-                { "equity": 40.0, "bond": 40.0, "infrastructure": 0.0, "property": 10.0, "commodities": 5.0, "cash": 5.0},
-            "GBP Strategic Bond":
-                { "equity": 0.0, "bond": 100.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
-            "Gbl ETF Equity - Europe ex UK":
-                {"equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0},
-            "Global": 
-                { "equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
-            "Global Bonds": 
-                { "equity": 0.0, "bond": 100.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
-            "Global Equities": 
-                { "equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
-            "Global Equity Income": 
-                { "equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
-            "Global Property": 
-                { "equity": 0.0, "bond": 0.0, "infrastructure": 0.0, "property": 100.0, "commodities": 0.0, "cash": 0.0 },
-            "Global Smaller Companies":
-                {"equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0},
-            "Infrastructure":
-                {"equity": 0.0, "bond": 0.0, "infrastructure": 100.0, "property": 0.0, "commodities": 0.0, "cash": 0.0},
-            "Japanese Smaller Companies":
-                {"equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0},
-            "Latin America":
-                { "equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
-            "Mixed Investment 0-35% Shares": 
-                { "equity": 20.0, "bond": 80.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
-            "Mixed Investment 20-60% Shares": 
-                { "equity": 40.0, "bond": 60.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
-            "Mixed Investment 40-85% Shares": 
-                { "equity": 62.5, "bond": 37.5, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
-            "Property": 
-                { "equity": 0.0, "bond": 0.0, "infrastructure": 0.0, "property": 100.0, "commodities": 0.0, "cash": 0.0 },
-            "Property Securities": 
-                { "equity": 0.0, "bond": 0.0, "infrastructure": 0.0, "property": 100.0, "commodities": 0.0, "cash": 0.0 },
-            "Property - UK Commercial": 
-                { "equity": 0.0, "bond": 0.0, "infrastructure": 0.0, "property": 100.0, "commodities": 0.0, "cash": 0.0 },
-            "Real Estate Investment Trusts":
-                { "equity": 0.0, "bond": 0.0, "infrastructure": 0.0, "property": 100.0, "commodities": 0.0, "cash": 0.0},
-            "Short Term Money Market": 
-                { "equity": 0.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 100.0 },
-            "Specialist": 
-                { "equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
-            "Technology & Telecommunications": 
-                { "equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
-            "UK All Companies": 
-                { "equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
-            "UK Equity Income": 
-                { "equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
-            "UK Smaller Companies": 
-                { "equity": 100.0, "bond": 0.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
-            "USD Index Linked": 
-                { "equity": 0.0, "bond": 100.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0 },
-            "With Profits":
-                # {"equity": 40.0, "bond": 45.0, "infrastructure": 0.0, "property": 15.0, "commodities": 0.0, "cash": 0.0},
-                {"equity": 0.0, "bond": 100.0, "infrastructure": 0.0, "property": 0.0, "commodities": 0.0, "cash": 0.0},
-            }
-
-        if sector not in splits.keys():
-            assert False, "ERROR: AssetAllocation(%s) - sector not defined" % (sector)
-
-        if override is not None:
-            logging.debug("AssetAllocation override=%s"%(override))
-            ss = override
-        else:
-            ss = splits[sector]
+        self._amounts = allocation_row(sector, override) * amount / 100.0
 
-        self._aa = {}
-        self._aa['equity'] = ss['equity'] * amount / 100.0
-        self._aa['bond'] = ss['bond'] * amount / 100.0
-        self._aa['infrastructure'] = ss['infrastructure'] * amount / 100.0
-        self._aa['property'] = ss['property'] * amount / 100.0
-        self._aa['commodities'] = ss['commodities'] * amount / 100.0
-        self._aa['cash'] = ss['cash'] * amount / 100.0
+    # Amounts in ASSET_CLASSES order
+    def amounts(self):
+        return self._amounts
 
     def allocation_equity(self):
-        return self._aa['equity']
+        return float(self._amounts[0])
 
     def allocation_bond(self):
-        return self._aa['bond']
+        return float(self._amounts[1])
 
     def allocation_infrastructure(self):
-        return self._aa['infrastructure']
+        return float(self._amounts[2])
 
     def allocation_property(self):
-        return self._aa['property']
+        return float(self._amounts[3])
 
     def allocation_commodity(self):
-        return self._aa['commodities']
+        return float(self._amounts[4])
 
     def allocation_cash(self):
-        return self._aa['cash']
+        return float(self._amounts[5])
 
     def __repr__(self):
-        s = "%s" % (self._aa)
+        s = "%s" % (dict(zip(ASSET_CLASSES, self._amounts.tolist())))
         return s
 
 
+# Parent sectors in display order
+PARENT_SECTORS = [
+    "Global Equity",
+    "Asia Pacific Equity",
+    "Europe Equity",
+    "UK Equity",
+    "Mixed Investment",
+    "Global Bonds",
+    "GBP Strategic Bond",
+    "Property",
+    "Commodities",
+    "Money Market"
+]
+
+# Parent sector of each sector
+SECTOR_PARENTS = {
+    "Asia Pacific Ex Japan": "Asia Pacific Equity",
+    "Asia Pacific Income": "Asia Pacific Equity",
+    "Asia Pacific Smaller Companies": "Asia Pacific Equity",
+    "Banks": "UK Equity",
+    "Cash": "Money Market",
+    "Commodities & Natural Resources": "Commodities",
+    "Debt - Loans & Bonds": "GBP Strategic Bond",
+    "Europe": "Europe Equity",
+    "Financials": "Global Equity",
+    "Flexible Investment": "Mixed Investment",
+    "GBP Strategic Bond": "GBP Strategic Bond",
+    "Gbl ETF Equity - Europe ex UK": "Europe Equity",
+    "Global": "Global Equity",
+    "Global Bonds": "Global Bonds",
+    "Global Equities": "Global Equity",
+    "Global Equity Income": "Global Equity",
+    "Global Property": "Property",
+    "Global Smaller Companies": "Global Equity",
+    "Infrastructure": "Mixed Investment",
+    "Japanese Smaller Companies": "Asia Pacific Equity",
+    "Latin America": "Global Equity",
+    "Mixed Investment 0-35% Shares": "Mixed Investment",
+    "Mixed Investment 20-60% Shares": "Mixed Investment",
+    "Mixed Investment 40-85% Shares": "Mixed Investment",
+    "Property": "Property",
+    "Property Securities": "Property",
+    "Property - UK Commercial": "Property",
+    "Real Estate Investment Trusts": "Property",
+    "Short Term Money Market": "Money Market",
+    "Specialist": "Global Equity",
+    "Technology & Telecommunications": "Global Equity",
+    "UK All Companies": "UK Equity",
+    "UK Equity Income": "UK Equity",
+    "UK Smaller Companies": "UK Equity",
+    "USD Index Linked": "Global Bonds",
+    "With Profits": "Mixed Investment"
+}
+
+
+def taxonomy_filename():
+    return os.getenv('HOME') + '/SecurityInfo/Config/sector_taxonomy.json'
+
+
+# Sectors and their parent sectors, each given an integer code so totals for
+# both levels can be built from an array of sector codes in one pass
+class SectorTaxonomy():
+    def __init__(self, parents, sector_parents):
+        self._parents = list(parents)
+        for parent in sector_parents.values():
+            if parent not in self._parents:
+                self._parents.append(parent)
+        parent_codes = {parent: n for n, parent in enumerate(self._parents)}
+        self._sectors = list(sector_parents.keys())
+        self._sector_codes = {sector: n for n, sector in enumerate(self._sectors)}
+        self._parent_of = np.array([parent_codes[p] for p in sector_parents.values()], dtype=np.intp)
+
+    def sectors(self):
+        return self._sectors
+
+    def parents(self):
+        return self._parents
+
+    def sector_code(self, sector):
+        if sector not in self._sector_codes:
+            assert False, "ERROR: SectorAllocation(%s) - sector not defined" % (sector)
+        return self._sector_codes[sector]
+
+    def sector(self, code):
+        return self._sectors[code]
+
+    def parent(self, code):
+        return self._parents[self._parent_of[code]]
+
+    # Totals by sector and by parent sector of amounts with the given sector
+    # codes. Both dicts are in order of first appearance in codes.
+    def rollup(self, codes, amounts):
+        codes = np.asarray(codes, dtype=np.intp)
+        amounts = np.asarray(amounts, dtype=float)
+        sector_totals = np.bincount(codes, amounts, minlength=len(self._sectors))
+        parent_codes = self._parent_of[codes]
+        parent_totals = np.bincount(parent_codes, amounts, minlength=len(self._parents))
+
+        sectors = {}
+        for code in first_appearance(codes):
+            sectors[self._sectors[code]] = float(sector_totals[code])
+        parents = {}
+        for code in first_appearance(parent_codes):
+            parents[self._parents[code]] = float(parent_totals[code])
+        return sectors, parents
+
+
+# Distinct values in the order they first appear
+def first_appearance(codes):
+    values, first = np.unique(codes, return_index=True)
+    return values[np.argsort(first)].tolist()
+
+
+# Taxonomy from a json file holding "parents" (display order) and
+# "sectors" (sector to parent sector)
+def load_taxonomy(full_path):
+    with open(full_path, 'r', encoding='utf-8-sig') as fp:
+        data = json.load(fp)
+    return SectorTaxonomy(data.get('parents', []), data['sectors'])
+
+
+_taxonomy = None
+
+# The taxonomy in use, loaded on first use from the config file if there is
+# one, otherwise the built-in sectors
+def sector_taxonomy():
+    global _taxonomy
+    if _taxonomy is None:
+        full_path = taxonomy_filename()
+        if os.path.isfile(full_path):
+            logging.debug("sector_taxonomy(%s)" % (full_path))
+            _taxonomy = load_taxonomy(full_path)
+        else:
+            _taxonomy = SectorTaxonomy(PARENT_SECTORS, SECTOR_PARENTS)
+    return _taxonomy
+
+def set_sector_taxonomy(taxonomy):
+    global _taxonomy
+    _taxonomy = taxonomy
+
+
 def parent_sector_list():
-    return [
-        "Global Equity",
-        "Asia Pacific Equity",
-        "Europe Equity"
-        "UK Equity",
-        "Mixed Investment",
-        "Global Bonds",
-        "GBP Strategic Bond",
-        "Property",
-        "Commodities",
-        "Money Market"
-    ]
+    return list(sector_taxonomy().parents())
+
 
 class SectorAllocation():
-    def __init__(self, sector, amount):
-        super_sector = {
-        "Asia Pacific Ex Japan": "Asia Pacific Equity",
-        "Asia Pacific Income": "Asia Pacific Equity",
-        "Asia Pacific Smaller Companies": "Asia Pacific Equity",
-        "Banks": "UK Equity",
-        "Cash": "Money Market",
-        "Commodities & Natural Resources": "Commodities",
-        "Debt - Loans & Bonds": "GBP Strategic Bond",
-        "Europe": "Europe Equity",
-        "Financials": "Global Equity",
-        "Flexible Investment": "Mixed Investment",
-        "GBP Strategic Bond": "GBP Strategic Bond",
-        "Gbl ETF Equity - Europe ex UK": "Europe Equity",
-        "Global": "Global Equity",
-        "Global Bonds": "Global Bonds",
-        "Global Equities": "Global Equity",
-        "Global Equity Income": "Global Equity",
-        "Global Property": "Property",
-        "Global Smaller Companies": "Global Equity",
-        "Infrastructure": "Mixed Investment",
-        "Japanese Smaller Companies": "Asia Pacific Equity",
-        "Latin America": "Global Equity",
-        "Mixed Investment 0-35% Shares": "Mixed Investment",
-        "Mixed Investment 20-60% Shares": "Mixed Investment",
-        "Mixed Investment 40-85% Shares": "Mixed Investment",
-        "Property": "Property",
-        "Property Securities": "Property",
-        "Property - UK Commercial": "Property",
-        "Real Estate Investment Trusts": "Property",
-        "Short Term Money Market": "Money Market",
-        "Specialist": "Global Equity",
-        "Technology & Telecommunications": "Global Equity",
-        "UK All Companies": "UK Equity",
-        "UK Equity Income": "UK Equity",
-        "UK Smaller Companies": "UK Equity",
-        "USD Index Linked": "Global Bonds",
-        "With Profits": "Mixed Investment"
-        }
-
-        if sector not in super_sector.keys():
-            assert False, "ERROR: SectorAllocation(%s) - sector not defined" % (sector)
+    __slots__ = ('_amount', '_code')
 
+    def __init__(self, sector, amount):
         self._amount = amount
-        self._sector = sector
-        self._parent_sector = super_sector[sector]
+        self._code = sector_taxonomy().sector_code(sector)
 
     def amount(self):
         return self._amount
 
+    def code(self):
+        return self._code
+
     def sector(self):
-        return self._sector
+        return sector_taxonomy().sector(self._code)
 
     def parent_sector(self):
-        return self._parent_sector
+        return sector_taxonomy().parent(self._code)
 
     def __repr__(self):
         s = "%s (%s) = %.2f" % (self.sector(), self.parent_sector(), self.amount())
         return s
-
@@ -0,0 +1,60 @@
+# Dates held as day numbers (days since 1970-01-01) and converted to text only for display
+
+from datetime import datetime, date, timedelta
+import numpy as np
+
+EPOCH = date(1970, 1, 1)
+
+# YYYYMMDD strings to datetime64[D] (NaT where missing)
+def date_array(dates):
+    return np.array([d[:4] + '-' + d[4:6] + '-' + d[6:] if isinstance(d, str) and d else 'NaT' for d in dates], dtype='datetime64[D]')
+
+# datetime64[D] to YYYYMMDD strings
+def date_strings(dates):
+    return [s.replace('-', '') for s in np.datetime_as_string(dates, unit='D')]
+
+def today():
+    return np.datetime64(datetime.today().date(), 'D')
+
+# Same day a year later, 29th February becoming 28th February
+def add_one_year(dates):
+    month = dates.astype('datetime64[M]')
+    day = (dates - month).astype(int)
+    month = month + 12
+    days_in_month = ((month + 1).astype('datetime64[D]') - month.astype('datetime64[D]')).astype(int)
+    return month.astype('datetime64[D]') + np.minimum(day, days_in_month - 1)
+
+# Same day a year earlier. 29th February becomes 1st March so that, as with
+# the YYYYMMDD string comparison it replaces, only dates up to the 28th are before it.
+def one_year_before(dates):
+    month = dates.astype('datetime64[M]')
+    day = dates - month.astype('datetime64[D]')
+    return (month - 12).astype('datetime64[D]') + day
+
+# Day number (days since 1970-01-01) from a YYYYMMDD string, date or datetime64
+def day_number(dt):
+    if isinstance(dt, str):
+        dt = date_array([dt])[0]
+    return int(np.datetime64(dt, 'D').astype(np.int64))
+
+def today_number():
+    return int(today().astype(np.int64))
+
+# Day numbers back to dates, for display
+def day_date(day):
+    return EPOCH + timedelta(days=int(day))
+
+def format_day(day, fmt='%Y%m%d'):
+    return day_date(day).strftime(fmt)
+
+# Day numbers of an array of datetime64 dates
+def day_numbers(dates):
+    return np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+
+# Day numbers (None or NaN where missing) to datetime64[D]
+def day_array(days):
+    days = np.array(days, dtype=float)
+    dates = np.full(len(days), np.datetime64('NaT'), dtype='datetime64[D]')
+    known = ~np.isnan(days)
+    dates[known] = days[known].astype(np.int64).astype('datetime64[D]')
+    return dates
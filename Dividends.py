@@ -0,0 +1,260 @@
+# Dividend history compiled into arrays so queries need no string parsing
+
+from datetime import datetime
+from collections import namedtuple
+from operator import attrgetter
+import heapq
+import threading
+import numpy as np
+import pandas as pd
+from Dates import date_array, date_strings, today, add_one_year, one_year_before, day_number, day_numbers
+
+# Dividend units as small integer codes. Code 0 means no unit was given.
+# Codes beyond the fixed four are assigned as other units are first seen, so
+# they only hold within one process (see DividendSchedule.__getstate__).
+UNIT_CODES = {None: 0, '%': 1, 'p': 2, 'c': 3}
+UNIT_NAMES = [None, '%', 'p', 'c']
+UNIT_LOCK = threading.Lock()
+
+def unit_code(unit):
+    try:
+        return UNIT_CODES[unit]
+    except KeyError:
+        with UNIT_LOCK:
+            if unit not in UNIT_CODES:
+                UNIT_CODES[unit] = len(UNIT_NAMES)
+                UNIT_NAMES.append(unit)
+            return UNIT_CODES[unit]
+
+def unit_name(code):
+    return UNIT_NAMES[code]
+
+
+# Days by which the oldest dividend dates are more than a year before asof
+# (default today). Zero or negative where not stale, NaT where unknown.
+def days_overdue(oldest, asof=None):
+    asof = today() if asof is None else np.datetime64(asof, 'D')
+    return (one_year_before(asof) - oldest).astype('timedelta64[D]')
+
+
+# Select dates to project up to end_projection (default 13 weeks). Dates after
+# today are kept as they are, earlier dates are assumed to recur a year later.
+# Returns indices of the selected dates, the projected dates and a mask of
+# those that were already in the future.
+def project_forward(dates, end_projection=None):
+    now = today()
+    if end_projection is None:
+        end = now + 7 * 13
+    else:
+        end = np.datetime64(end_projection.date() if isinstance(end_projection, datetime) else end_projection, 'D')
+
+    future = dates > now
+    estimated = add_one_year(dates)
+    keep = future | ((estimated > now) & (estimated <= end))
+    idx = np.flatnonzero(keep)
+    return idx, np.where(future, dates, estimated)[idx], future[idx]
+
+
+# Day numbers of the dates as a list, None where the date is missing
+def day_keys(dates):
+    return [None if m else d for d, m in zip(day_numbers(dates).tolist(), np.isnat(dates).tolist())]
+
+
+# Indices of the last entry for each distinct key, in order of first appearance
+def last_index(keys):
+    index = {}
+    for n, k in enumerate(keys):
+        if k is not None:
+            index[k] = n
+    return list(index.keys()), np.array(list(index.values()), dtype=np.intp)
+
+
+# A dividend paid or declared on a position: day number, amount in pounds
+DividendEvent = namedtuple('DividendEvent', ('day', 'amount', 'position'))
+
+EVENT_DAY = attrgetter('day')
+
+
+# Events of several streams, each sorted by day (descending if reverse), as
+# one stream in day order. Events on the same day keep the order of the
+# streams they came from, so nothing is gathered or sorted as a whole.
+def merge_events(streams, reverse=False):
+    return heapq.merge(*streams, key=EVENT_DAY, reverse=reverse)
+
+
+# Events as a dict of day number to list of events
+def group_events(events):
+    grouped = {}
+    for ev in events:
+        grouped.setdefault(ev.day, []).append(ev)
+    return grouped
+
+
+class DividendSchedule:
+    def __init__(self, divis, actual=True, compiled=None):
+        # actual is False when payments were generated rather than taken from the json
+        self._actual = actual
+        self._compiled = compiled
+        self._tags = [d.get('tag') for d in divis]
+        exdiv = [d.get('ex-div') for d in divis]
+        payment = [d.get('payment') for d in divis]
+        self._exdiv = date_array(exdiv)
+        self._payment = date_array(payment)
+        self._amount = np.array([d.get('amount', np.nan) for d in divis], dtype=float)
+        self._unit = np.array([unit_code(d.get('unit')) for d in divis], dtype=np.int8)
+        self._payment_keys, self._payment_idx = last_index(day_keys(self._payment))
+        self._exdiv_keys, self._exdiv_idx = last_index(day_keys(self._exdiv))
+
+    # Unit codes are assigned as units are first seen in this process, so
+    # they are pickled as the unit strings and coded again on load
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_unit'] = [unit_name(u) for u in self._unit.tolist()]
+        return state
+
+    def __setstate__(self, state):
+        state['_unit'] = np.array([unit_code(u) for u in state['_unit']], dtype=np.int8)
+        self.__dict__.update(state)
+
+    def actual(self):
+        return self._actual
+
+    def compiled(self):
+        return self._compiled
+
+    def __len__(self):
+        return len(self._tags)
+
+    def tags(self):
+        return self._tags
+
+    def exdiv(self):
+        return self._exdiv
+
+    def payment(self):
+        return self._payment
+
+    # Amount per share, NaN where only a yield is known
+    def amount(self):
+        return self._amount
+
+    def unit(self):
+        return self._unit
+
+    # Distinct payment day numbers (last entry wins) as keys and indices into the arrays
+    def payment_keys(self):
+        return self._payment_keys
+
+    def payment_index(self):
+        return self._payment_idx
+
+    def exdiv_keys(self):
+        return self._exdiv_keys
+
+    def exdiv_index(self):
+        return self._exdiv_idx
+
+    def __repr__(self):
+        return "DividendSchedule(%s)" % (list(zip(date_strings(self._exdiv), date_strings(self._payment), self._amount.tolist())))
+
+
+# Dividend events of every security in the universe, held sorted by payment
+# date and by ex-div date so that a date range is found by binary search.
+class DividendEventIndex:
+    KEYS = ('payment', 'ex-div')
+
+    def __init__(self):
+        self._names = []
+        self._ids = {}
+        self._structure = []
+        self._freq = []
+        self._by = {}
+        for key in self.KEYS:
+            self._by[key] = {'sid': np.empty(0, dtype=np.int32),
+                             'ex-div': np.empty(0, dtype=np.int64),
+                             'payment': np.empty(0, dtype=np.int64),
+                             'amount': np.empty(0, dtype=float),
+                             'unit': np.empty(0, dtype=np.int8)}
+
+    def security_id(self, sname):
+        if sname not in self._ids:
+            self._ids[sname] = len(self._names)
+            self._names.append(sname)
+            self._structure.append(None)
+            self._freq.append(None)
+        return self._ids[sname]
+
+    def __len__(self):
+        return len(self._by['payment']['sid'])
+
+    # Add (or replace) the events of one security
+    def add(self, sname, schedule, structure=None, freq=None):
+        self.add_many([(sname, schedule, structure, freq)])
+
+    # Add (or replace) the events of many (sname, schedule, structure, freq)
+    # at once: their rows are appended to the table and each ordering is
+    # rebuilt with one stable sort, so events on the same date stay in the
+    # order they were added
+    def add_many(self, entries):
+        rows = []
+        for sname, schedule, structure, freq in entries:
+            self.remove(sname)
+            sid = self.security_id(sname)
+            self._structure[sid] = structure
+            self._freq[sid] = freq
+            if schedule is not None and len(schedule) > 0:
+                rows.append(self.schedule_rows(sid, schedule))
+        if not rows:
+            return
+
+        for key in self.KEYS:
+            table = self._by[key]
+            columns = {col: np.concatenate([table[col]] + [r[col] for r in rows]) for col in table.keys()}
+            order = np.argsort(columns[key], kind='stable')
+            self._by[key] = {col: values[order] for col, values in columns.items()}
+
+    # Columns of one security's events with both dates present
+    def schedule_rows(self, sid, schedule):
+        valid = ~(np.isnat(schedule.payment()) | np.isnat(schedule.exdiv()))
+        return {'sid': np.full(valid.sum(), sid, dtype=np.int32),
+                'ex-div': schedule.exdiv()[valid].astype(np.int64),
+                'payment': schedule.payment()[valid].astype(np.int64),
+                'amount': schedule.amount()[valid],
+                'unit': schedule.unit()[valid]}
+
+    def remove(self, sname):
+        if sname not in self._ids:
+            return
+        sid = self._ids[sname]
+        for key in self.KEYS:
+            table = self._by[key]
+            keep = table['sid'] != sid
+            if not keep.all():
+                for col in table.keys():
+                    table[col] = table[col][keep]
+
+    # Events with the key date (payment or ex-div) between start and end inclusive,
+    # optionally only for the given snames, structures or payout frequencies
+    def query(self, start, end, key='payment', snames=None, structure=None, freq=None):
+        table = self._by[key]
+        lo = np.searchsorted(table[key], day_number(start), side='left')
+        hi = np.searchsorted(table[key], day_number(end), side='right')
+        sid = table['sid'][lo:hi]
+
+        if snames is not None or structure is not None or freq is not None:
+            allowed = np.ones(len(self._names), dtype=bool)
+            if snames is not None:
+                allowed &= np.isin(self._names, list(snames))
+            if structure is not None:
+                allowed &= np.isin(np.array(self._structure, dtype=object), [structure] if isinstance(structure, str) else list(structure))
+            if freq is not None:
+                allowed &= np.isin(np.array(self._freq, dtype=object), [freq] if isinstance(freq, str) else list(freq))
+            rows = np.flatnonzero(allowed[sid]) + lo
+        else:
+            rows = np.arange(lo, hi)
+
+        return pd.DataFrame({'sname': np.array(self._names, dtype=object)[table['sid'][rows]],
+                             'ex-div': table['ex-div'][rows].astype('datetime64[D]'),
+                             'payment': table['payment'][rows].astype('datetime64[D]'),
+                             'amount': table['amount'][rows],
+                             'unit': [UNIT_NAMES[u] for u in table['unit'][rows]]})
@@ -0,0 +1,100 @@
+# Projected dividend income of many positions computed as whole arrays
+
+import logging
+import numpy as np
+import pandas as pd
+
+from Dividends import project_forward
+from Dates import day_numbers
+from Money import truncate_pence
+
+
+# Start year of the UK tax year (ending 5th April) each date falls in
+def tax_years(dates):
+    year = dates.astype('datetime64[Y]')
+    april5 = (year.astype('datetime64[M]') + 3).astype('datetime64[D]') + 4
+    return year.astype(int) + 1970 - (dates <= april5)
+
+
+# Projected payments of every position up to end_projection (default 13
+# weeks) as one DataFrame with a row per payment in position order:
+#   date, account, user, account type, security, quantity, value,
+#   amount (whole pence, truncated), status (' * ' declared, 'Est' estimated),
+#   tax year, yield and unit (as the security projects them) and freq.
+# Each distinct security's schedule is gathered once and all dates are
+# projected together; positions are then joined to their security's payments.
+def income_calendar(positions, end_projection=None):
+    securities = []
+    sec_codes = {}
+    pos_sec = np.empty(len(positions), dtype=np.intp)
+    for n, pos in enumerate(positions):
+        sec = pos.security()
+        if id(sec) not in sec_codes:
+            sec_codes[id(sec)] = len(securities)
+            securities.append(sec)
+        pos_sec[n] = sec_codes[id(sec)]
+
+    # Distinct payment dates and amounts per share of all securities
+    dates = []
+    amounts = []
+    sids = []
+    for sid, sec in enumerate(securities):
+        d, a = sec.payment_amounts()
+        dates.append(d)
+        amounts.append(a)
+        sids.append(np.full(len(d), sid, dtype=np.intp))
+    dates = np.concatenate(dates) if dates else np.empty(0, dtype='datetime64[D]')
+    amounts = np.concatenate(amounts) if amounts else np.empty(0)
+    sids = np.concatenate(sids) if sids else np.empty(0, dtype=np.intp)
+
+    idx, pdates, future = project_forward(dates, end_projection)
+    ev_sid = sids[idx]
+    ev_day = day_numbers(pdates)
+    ev_amount = amounts[idx]
+
+    # Yield and unit as each security reports them for the same payment day
+    ev_yield = np.empty(len(idx), dtype=object)
+    ev_unit = np.empty(len(idx), dtype=object)
+    ev_yield[:] = ''
+    ev_unit[:] = ''
+    projected = [None] * len(securities)
+    for e, (sid, day) in enumerate(zip(ev_sid.tolist(), ev_day.tolist())):
+        if projected[sid] is None:
+            projected[sid] = {d['payment']: (d['amount'], d['unit']) for d in securities[sid].projected_dividends(end_projection)}
+        if day in projected[sid]:
+            ev_yield[e], ev_unit[e] = projected[sid][day]
+
+    # Events grouped by security (in projection order within each) so each
+    # position takes a contiguous run of them
+    order = np.argsort(ev_sid, kind='stable')
+    counts = np.bincount(ev_sid, minlength=len(securities))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1])) if len(securities) else np.empty(0, dtype=np.intp)
+    per_pos = counts[pos_sec]
+    rows = np.repeat(np.arange(len(positions)), per_pos)
+    within = np.arange(len(rows)) - np.repeat(np.cumsum(per_pos) - per_pos, per_pos)
+    ev = order[starts[pos_sec][rows] + within]
+
+    quantity = np.array([pos.quantity() for pos in positions], dtype=float)
+    value = np.array([pos.value() for pos in positions], dtype=float)
+    account = np.array(["%s_%s_%s" % (pos.account().usercode(), pos.platform(), pos.account_type()) for pos in positions], dtype=object)
+    user = np.array([pos.username() for pos in positions], dtype=object)
+    acctype = np.array([pos.account_type() for pos in positions], dtype=object)
+    sname = np.array([pos.sname() for pos in positions], dtype=object)
+    freq = np.array([sec.payout_frequency() or "" for sec in securities], dtype=object)
+
+    day = ev_day[ev].astype('datetime64[D]')
+    ty = tax_years(day)
+    logging.debug("income_calendar positions=%d securities=%d payments=%d" % (len(positions), len(securities), len(rows)))
+    return pd.DataFrame({'date': day,
+                         'account': account[rows],
+                         'user': user[rows],
+                         'account type': acctype[rows],
+                         'security': sname[rows],
+                         'quantity': quantity[rows],
+                         'value': value[rows],
+                         'amount': truncate_pence(quantity[rows] * ev_amount[ev] / 100.0),
+                         'status': np.where(future[ev], " * ", "Est"),
+                         'tax year': ["%d/%d" % (y, y - 2000 + 1) for y in ty.tolist()],
+                         'yield': ev_yield[ev],
+                         'unit': ev_unit[ev],
+                         'freq': freq[pos_sec[rows]]})
@@ -0,0 +1,82 @@
+# Look-through of positions to the sectors of their underlying holdings
+
+import logging
+import numpy as np
+import pandas as pd
+
+
+# Percentages by sector for a position's security. Funds with a SECTOR
+# BREAKDOWN are split across it, anything else is wholly in its own sector.
+def position_sector_split(pos):
+    brk = pos.security().sector_breakdown()
+    return brk if brk else {pos.sector(): 100.0}
+
+
+# Sector exposure of a list of positions. Each distinct security contributes
+# one row of sector fractions to a matrix; position values times those rows
+# gives the exposure of every position, which is then summed over any grouping.
+class SectorLookThrough():
+    def __init__(self, positions):
+        self._positions = positions
+        self._sectors = {}
+        rows = {}
+        sec_idx = np.empty(len(positions), dtype=np.intp)
+        for n, pos in enumerate(positions):
+            sname = pos.sname()
+            if sname not in rows:
+                split = position_sector_split(pos)
+                for sector in split.keys():
+                    self._sectors.setdefault(sector, len(self._sectors))
+                rows[sname] = (len(rows), split)
+            sec_idx[n] = rows[sname][0]
+
+        matrix = np.zeros((len(rows), len(self._sectors)))
+        for row, split in rows.values():
+            for sector, percent in split.items():
+                matrix[row, self._sectors[sector]] = percent / 100.0
+
+        values = np.array([pos.value() for pos in positions], dtype=float)
+        self._exposure = values[:, None] * matrix[sec_idx]
+        logging.debug("SectorLookThrough positions=%d securities=%d sectors=%d" % (len(positions), len(rows), len(self._sectors)))
+
+    def sectors(self):
+        return list(self._sectors.keys())
+
+    # Value of each position (rows) in each sector (columns)
+    def exposure(self):
+        return self._exposure
+
+    # Total value by sector, largest first
+    def breakdown(self):
+        totals = self._exposure.sum(axis=0)
+        order = np.argsort(-totals, kind='stable')
+        sectors = self.sectors()
+        return {sectors[i]: float(totals[i]) for i in order}
+
+    # Sector totals for groups of positions. levels maps each level name to a
+    # list holding the group of every position; all levels are summed in a
+    # single matrix product. Returns a DataFrame indexed by (level, group).
+    def aggregate(self, levels):
+        index = []
+        rows = []
+        cols = []
+        for level, labels in levels.items():
+            codes, groups = pd.factorize(pd.Series(labels, dtype=object))
+            rows.append(codes + len(index))
+            cols.append(np.arange(len(labels)))
+            index += [(level, g) for g in groups]
+
+        weights = np.zeros((len(index), len(self._positions)))
+        if index:
+            weights[np.concatenate(rows), np.concatenate(cols)] = 1.0
+        return pd.DataFrame(weights @ self._exposure,
+                            index=pd.MultiIndex.from_tuples(index, names=['level', 'group']),
+                            columns=self.sectors())
+
+    # Sector exposure by account, by user and for the household in one pass
+    def report(self):
+        positions = self._positions
+        levels = {'account': ["%s_%s_%s" % (pos.account().usercode(), pos.platform(), pos.account_type()) for pos in positions],
+                  'user': [pos.username() for pos in positions],
+                  'household': ['Household'] * len(positions)}
+        return self.aggregate(levels)
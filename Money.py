@@ -0,0 +1,40 @@
+# Money held as whole pence in int64 so sums are exact and truncation
+# needs no Decimal. Pounds (float) are produced only for display.
+
+import numpy as np
+
+PENCE_PER_POUND = 100
+
+
+def scalar_or_array(a):
+    return a.item() if a.ndim == 0 else a
+
+
+# Pounds to the nearest penny
+def to_pence(pounds):
+    return scalar_or_array(np.rint(np.asarray(pounds, dtype=float) * PENCE_PER_POUND).astype(np.int64))
+
+
+# Pounds truncated towards zero to whole pence. Products within rounding error
+# of a whole penny are settled exactly from the float's integer ratio, so the
+# result is that of truncating the float's exact decimal value.
+def truncate_pence(pounds):
+    pounds = np.asarray(pounds, dtype=float)
+    flat = pounds.reshape(-1)
+    scaled = flat * PENCE_PER_POUND
+    pence = np.trunc(scaled)
+    close = np.abs(scaled - np.rint(scaled)) < 1e-6
+    for i in np.flatnonzero(close):
+        n, d = float(flat[i]).as_integer_ratio()
+        p = abs(n) * PENCE_PER_POUND // d
+        pence[i] = p if n >= 0 else -p
+    return scalar_or_array(pence.astype(np.int64).reshape(pounds.shape))
+
+
+def to_pounds(pence):
+    return scalar_or_array(np.asarray(pence, dtype=np.int64) / PENCE_PER_POUND)
+
+
+# "1,234.56" for an amount in pence
+def format_pence(pence):
+    return "{0:,.2f}".format(pence / PENCE_PER_POUND)
@@ -13,6 +13,7 @@ from pathlib import Path
 
 from SecurityClasses import SecurityUniverse
 from PositionClasses import Position
+from Dates import day_number
 
 
 def platformCode_to_class(code):
@@ -30,10 +31,11 @@ class Platform:
     def vdate(self):
         return self._vdate
 
+    # Valuation date (day number) taken from the dated summary file name
     def set_vdate(self, summary_file):
         # filename = os.readlink(self.userdata_dirname() + '/' + summary_file)
         filename = os.readlink(summary_file)
-        self._vdate = re.sub('\.csv$','',re.sub('^.*_','',filename))
+        self._vdate = day_number(re.sub('\.csv$','',re.sub('^.*_','',filename)))
 
     def load_positions(self, secu, userCode, accountType, summary_file=None):
         positions = []
@@ -44,15 +46,14 @@ class Platform:
         df = pd.read_csv(summary_file)
         print("DATAFRAME:\n%s", df)
         labels = ['Investment', 'Quantity', 'Price', 'Value (£)']
+        securities = secu.find_securities(df['Investment'])
         for n in range(0, len(df)):
-            inv = df['Investment'][n]
-            sym = inv
             qty = float(re.sub(',', '', str(df['Quantity'][n])))
             price = float(df['Price'][n])
             value = float(re.sub(',', '', str(df['Value (£)'][n])))
             cost  = value
 
-            security = secu.find_security(sym)
+            security = securities[n]
             pos = Position(security, qty, price, value, cost, self.vdate())
 
             # print("New Position=%s" % (pos))
@@ -178,27 +179,22 @@ class AJB(Platform):
         self.set_vdate(summary_file)
         df = pd.read_csv(summary_file)
         labels = ['Investment', 'Quantity', 'Price', 'Value (£)']
-        for n in range(0, len(df)):
-            inv = df['Investment'][n]
-            if 'LSE:' in inv:
-                sym = re.sub('.*\(LSE:(.*)\).*', '\\1', inv) + ".L"
-            elif 'FUND:' in inv:
-                sym = re.sub('.*\(FUND:(.*)\).*', '\\1', inv)
-            elif 'SEDOL:' in inv:
-                sym = re.sub('.*\(SEDOL:(.*)\).*', '\\1', inv)
-            else:
-                sym = inv
 
+        # Extract symbols for the whole file, e.g. "Name (LSE:TMPL)" => TMPL.L
+        inv = df['Investment']
+        syms = inv.str.extract(r'.*\(LSE:(.*)\).*', expand=False) + ".L"
+        syms = syms.fillna(inv.str.extract(r'.*\(FUND:(.*)\).*', expand=False))
+        syms = syms.fillna(inv.str.extract(r'.*\(SEDOL:(.*)\).*', expand=False))
+        syms = syms.fillna(inv).mask(inv == 'Cash GBP', 'Cash')
+        securities = secu.find_securities(syms)
+
+        for n in range(0, len(df)):
             qty   = float(re.sub(',', '', df['Quantity'][n]))
             price = float(df['Price'][n]) * 100.0
             value = float(re.sub(',', '', df['Value (£)'][n]))
             cost  = float(re.sub(',', '', df['Cost (£)'][n]))
 
-            if sym in ('Cash GBP'):
-                security = secu.find_security('Cash')
-            else:
-                security = secu.find_security(sym)
-
+            security = securities[n]
             pos = Position(security, qty, price, value, cost, self.vdate())
             # print("New Position=%s" % (pos))
             positions.append(pos)
@@ -270,30 +266,26 @@ class II(Platform):
         # print(df.head(5))
         # labels = ['Symbol', 'Qty', 'Price', 'Market Value']
 
+        # Skip worthless positions from fractions of units
+        values = df['Market Value'].str.replace('[,£]', '', regex=True).astype(float)
+        is_cash = df['Symbol'] == 'Cash GBP.L'
+        keep = is_cash | ~(values < 1.0)
+        syms = df['Symbol'].mask(is_cash, 'Cash')
+        securities = dict(zip(df.index[keep], secu.find_securities(syms[keep])))
+
         for n in range(0, len(df)):
-            sym = df['Symbol'][n]
-            # print("Symbol=%s" % (sym))
-            qty = df['Qty'][n]
-            # print("Qty=%s" % (qty))
+            if not keep[n]:
+                continue
+            # print("Symbol=%s" % (df['Symbol'][n]))
             qty = float(re.sub(',', '', str(df['Qty'][n])))
             if '£' in str(df['Price'][n]):
                 price = float(re.sub('[,£]', '', str(df['Price'][n]))) * 100.0
             else:
                 price = float(re.sub('[,p]', '', str(df['Price'][n])))
-            s_value = df['Market Value'][n]
-            s_cost = df['Book Cost'][n]
-
-            value = float(re.sub('[,£]', '', s_value))
-            cost  = float(re.sub('[,£]', '', s_cost))
-
-            if sym in ('Cash GBP.L'):
-                security = secu.find_security('Cash')
-            else:
-                # Skip worthless positions from fractions of units
-                if value < 1.0:
-                    continue
-                security = secu.find_security(sym)
+            value = values[n]
+            cost  = float(re.sub('[,£]', '', df['Book Cost'][n]))
 
+            security = securities[n]
             pos = Position(security, qty, price, value, cost, self.vdate())
             # print("New Position=%s" % (pos))
             positions.append(pos)
@@ -343,15 +335,14 @@ class AV(Platform):
         df = pd.read_csv(summary_file)
         labels = ['Symbol', 'Qty', 'Price', 'Market Value']
 
+        securities = secu.find_securities(df['Symbol'])
         for n in range(0, len(df)):
-            sym = df['Symbol'][n]
-            # print("SYM=%s" % (sym))
             qty = float(re.sub(',', '', str(df['Qty'][n])))
             price = float(re.sub('[,p]', '', str(df['Price'][n])))
             mv = df['Market Value'][n]
             value = float(re.sub('[,£]', '', mv))
             cost = value
-            security = secu.find_security(sym)
+            security = securities[n]
             pos = Position(security, qty, price, value, cost, self.vdate())
             # print("New Position=%s" % (pos))
             positions.append(pos)
@@ -6,14 +6,34 @@ import json
 import logging
 
 from SecurityClasses import SecurityUniverse
-from AccountClasses import Account, AccountGroup
+from AccountClasses import Account, AccountIndex, ASSET_TYPES, event_details
+from PositionTable import PositionTable
 from Breakdown import parent_sector_list
+from LookThrough import SectorLookThrough
+from PortfolioCube import PortfolioCube
+from Dates import day_date, format_day
+from Money import to_pence, format_pence
+
+
+# Price of each security held in the accounts, by id. A Security keeps the
+# price of the last position loaded in it, so loading an account can reprice
+# securities other accounts hold.
+def security_prices(accounts):
+    return {id(pos.security()): pos.security().price() for acct in accounts for pos in acct.positions()}
+
+
+# Accounts holding a security whose price is no longer the one in prices
+def repriced_accounts(accounts, prices):
+    return [acct for acct in accounts
+            if any(prices.get(id(pos.security()), pos.security().price()) != pos.security().price() for pos in acct.positions())]
+
 
 class UserPortfolio():
     def __init__(self, secu, username, defn):
         self._username = username
         self._defn = defn
         self._accounts = []
+        self._index = AccountIndex()
         for accdefn in defn['accounts']:
             self.add_account(secu, accdefn)
 
@@ -53,46 +73,75 @@ class UserPortfolio():
     def savShortfall(self):
         return self._defn['savShortfall']
 
+    # Filtered accounts and positions are memoised by the index and shared
+    def group(self, account_type=None, platform_name=None):
+        return self._index.group(None, account_type, platform_name)
+
     def accounts(self, account_type=None, platform_name=None):
-        return AccountGroup(self._accounts, account_type, platform_name).accounts()
+        return self.group(account_type, platform_name).accounts()
 
     def positions(self, account_type=None, platform_name=None):
-        return AccountGroup(self._accounts, account_type, platform_name).positions()
+        return self.group(account_type, platform_name).positions()
 
     def add_account(self, secu, defn):
         if defn['status'] == 'active':
             account = Account(secu, self.username(), defn)
             self._accounts.append(account)
+            self._index.add_account(account)
+
+    # Load an account again from its definition in place of the old one.
+    # Other accounts holding a security it reprices lose their summaries.
+    def reload_account(self, secu, account):
+        prices = security_prices(self._accounts)
+        n = self._accounts.index(account)
+        self._accounts[n] = Account(secu, self.username(), account.defn())
+        self._index.replace_account(account, self._accounts[n])
+        for acct in repriced_accounts(self._accounts[:n] + self._accounts[n+1:], prices):
+            acct.clear_summary()
+        return self._accounts[n]
+
+    # Combined summary of the filtered accounts
+    def summary(self, account_type=None, platform_name=None):
+        return self.group(account_type, platform_name).summary()
 
     # ====== Assets ======
 
     def asset_value(self, asset_type, account_type=None, platform_name=None):
-        return AccountGroup(self.accounts(), account_type, platform_name).asset_value(asset_type)
+        return self.group(account_type, platform_name).asset_value(asset_type)
+
+    def asset_class_values(self, account_type=None, platform_name=None):
+        return self.group(account_type, platform_name).asset_class_values()
 
     # ====== Income ======
 
     def annual_income(self, account_type=None, platform_name=None):
-        return AccountGroup(self.accounts(), account_type, platform_name).annual_income()
+        return self.group(account_type, platform_name).annual_income()
+
+    def dividend_events(self, info='PAYMENTS', account_type=None, platform_name=None, reverse=False):
+        return self.group(account_type, platform_name).dividend_events(info, reverse)
 
     def dividend_payments(self, account_type=None, platform_name=None):
-        return AccountGroup(self.accounts(), account_type, platform_name).dividend_payments()
+        return self.group(account_type, platform_name).dividend_payments()
 
     def dividend_declarations(self, account_type=None, platform_name=None):
-        return AccountGroup(self.accounts(), account_type, platform_name).dividend_declarations()
+        return self.group(account_type, platform_name).dividend_declarations()
 
     # ====== Breakdown ======
 
     def asset_breakdown(self, account_type=None, platform_name=None):
-        return AccountGroup(self.accounts(), account_type, platform_name).asset_breakdown()
+        return self.group(account_type, platform_name).asset_breakdown()
 
     def region_breakdown(self, account_type=None, platform_name=None):
-        return AccountGroup(self.accounts(), account_type, platform_name).region_breakdown()
+        return self.group(account_type, platform_name).region_breakdown()
 
     def sector_breakdown(self, account_type=None, platform_name=None):
-        return AccountGroup(self.accounts(), account_type, platform_name).sector_breakdown()
+        return self.group(account_type, platform_name).sector_breakdown()
 
     def parent_sector_breakdown(self, account_type=None, platform_name=None):
-        return AccountGroup(self.accounts(), account_type, platform_name).parent_sector_breakdown()
+        return self.group(account_type, platform_name).parent_sector_breakdown()
+
+    def lookthrough_sector_breakdown(self, account_type=None, platform_name=None):
+        return self.group(account_type, platform_name).lookthrough_sector_breakdown()
 
     # ====== String representation ======
 
@@ -115,8 +164,10 @@ class UserPortfolioGroup():
         logging.debug('UserPortfolioGroup(%s)'%(AccountInfo))
         self._rootdir = AccountInfo
         self.refresh(secu)
+        secu.add_listener(self.securities_changed)
 
     def refresh(self, secu):
+        self._secu = secu
         self._portfolios = {}
 
         for file in os.listdir(self._rootdir):
@@ -128,6 +179,67 @@ class UserPortfolioGroup():
             username = defn['user']
             self.load_portfolio(secu, username, defn)
 
+        # Every account indexed for filtering, in user then account order
+        self._index = AccountIndex(a for u in self.users() for a in self.portfolio(u).accounts())
+
+        # Columns of every position; accounts and positions become views of it
+        self._table = PositionTable(self.accounts())
+
+        # Account summaries by user, account type and platform
+        self._cube = PortfolioCube(self.accounts())
+
+    # Reload one account. Only its entries in the index, its rows of the
+    # position table and its cell of the cube are replaced; other accounts
+    # keep their summaries unless it reprices a security they hold.
+    def reload_account(self, secu, account):
+        prices = security_prices(self.accounts())
+        new = self.portfolio(account.username()).reload_account(secu, account)
+        self._index.replace_account(account, new)
+        self._table.replace_account(account, new)
+        self._cube.replace_account(account, new)
+        self.recompute_accounts(repriced_accounts([acct for acct in self.accounts() if acct is not new], prices))
+        return new
+
+    # Listener for SecurityUniverse.refresh(): positions in the reloaded
+    # securities are re-linked to the new Security objects and the affected
+    # accounts' summaries and cube cells recomputed. Returns those accounts.
+    def securities_changed(self, snames):
+        replaced = {}
+        accounts = []
+        for acct in self.accounts():
+            affected = False
+            for pos in acct.positions():
+                sname = pos.sname()
+                if sname in snames and sname in self._secu.security_names():
+                    old = pos.security()
+                    new = self._secu.security(sname)
+                    if new is not old:
+                        pos.set_security(new)
+                        replaced[id(old)] = new
+                        affected = True
+            if affected:
+                accounts.append(acct)
+        self._table.replace_securities(replaced)
+        self.recompute_accounts(accounts)
+        logging.debug("securities_changed(%s) accounts=%d" % (sorted(snames), len(accounts)))
+        return accounts
+
+    # Totals of the accounts are recomputed, in their summaries and the cube
+    def recompute_accounts(self, accounts):
+        for acct in accounts:
+            acct.clear_summary()
+            self._cube.replace_account(acct, acct)
+
+    def position_table(self):
+        return self._table
+
+    def cube(self):
+        return self._cube
+
+    # Totals of the filtered accounts from the cube
+    def summary(self, user=None, account_type=None, platform_name=None):
+        return self._cube.summary(user, account_type, platform_name)
+
     def users(self):
         return self._portfolios.keys()
     
@@ -145,21 +257,15 @@ class UserPortfolioGroup():
                     return accounts[0]
         return None
 
+    # Filtered accounts and positions are memoised by the index and shared
+    def group(self, user=None, account_type=None, platform_name=None):
+        return self._index.group(user, account_type, platform_name)
+
     def accounts(self, user=None, account_type=None, platform_name=None):
-        acclist = []
-        for u in self.users():
-            if user is None or user == u:
-                for a in self.portfolio(u).accounts(account_type, platform_name):
-                    acclist.append(a)
-        return acclist
+        return self.group(user, account_type, platform_name).accounts()
 
     def positions(self, user=None, account_type=None, platform_name=None):
-        poslist = []
-        for u in self.users():
-            if user is None or user == u:
-                for p in self.portfolio(u).positions(account_type,platform_name):
-                    poslist.append(p)
-        return poslist
+        return self.group(user, account_type, platform_name).positions()
 
     def load_definition(self, full_path):
         with open(full_path, 'r', encoding='utf-8-sig') as fp:
@@ -172,11 +278,17 @@ class UserPortfolioGroup():
     # ====== Assets ======
 
     def asset_value(self, asset_type, user=None, account_type=None, platform_name=None):
-        total = 0.0
-        for u in self.users():
-            if user is None or user == u:
-                total += self.portfolio(u).asset_value(asset_type, account_type, platform_name)
-        return total
+        if asset_type == 'ALL':
+            return self.summary(user, account_type, platform_name).value()
+
+        if asset_type not in ASSET_TYPES.keys():
+            assert True, "Unknown asset type (%s)" % asset_type
+            return 0.0
+        return self.asset_class_values(user, account_type, platform_name)[ASSET_TYPES[asset_type]]
+
+    # Value in each asset class for the filtered accounts of all users
+    def asset_class_values(self, user=None, account_type=None, platform_name=None):
+        return self.summary(user, account_type, platform_name).asset_class_values()
     
     def value(self, user=None, account_type=None, platform_name=None):
         return self.asset_value('ALL', user, account_type, platform_name)
@@ -202,81 +314,43 @@ class UserPortfolioGroup():
     # ====== Income ======
 
     def annual_income(self, user=None, account_type=None, platform_name=None):
-        total = 0.0
-        for u in self.users():
-            if user is None or user == u:
-                total += self.portfolio(u).annual_income(account_type, platform_name)
-        return total
+        return self.summary(user, account_type, platform_name).annual_income()
+
+    # Payments or declarations of the filtered accounts streamed in day order
+    # (latest first if reverse), merged from each account's sorted events
+    def dividend_events(self, info='PAYMENTS', user=None, account_type=None, platform_name=None, reverse=False):
+        return self.group(user, account_type, platform_name).dividend_events(info, reverse)
 
     def dividend_payments(self, user=None, account_type=None, platform_name=None):
-        payments = {}
-        for u in self.users():
-            if user is None or user == u:
-                dp = self.portfolio(u).dividend_payments(account_type, platform_name)
-                for dt in dp.keys():
-                    if dt not in payments.keys():
-                        payments[dt] = []
-                    for a in dp[dt]:
-                        payments[dt].append(a)
-        return payments
+        return event_details(self.dividend_events('PAYMENTS', user, account_type, platform_name))
 
     def dividend_declarations(self, user=None, account_type=None, platform_name=None):
-        declarations = {}
-        for u in self.users():
-            if user is None or user == u:
-                dp = self.portfolio(u).dividend_declarations(account_type, platform_name)
-                for dt in dp.keys():
-                    if dt not in declarations.keys():
-                        declarations[dt] = []
-                    for a in dp[dt]:
-                        declarations[dt].append(a)
-        return declarations
+        return event_details(self.dividend_events('DECLARATIONS', user, account_type, platform_name))
 
     # ====== Breakdown ======
 
     def asset_breakdown(self, user=None, account_type=None, platform_name=None):
-        brk = {}
-        for u in self.users():
-            if user is None or user == u:
-                b = self.portfolio(u).asset_breakdown(account_type, platform_name)
-                for k in b.keys():
-                    if k not in brk.keys():
-                        brk[k] = 0.0
-                    brk[k] += b[k]
-        return brk
+        return self.summary(user, account_type, platform_name).asset_breakdown()
 
     def region_breakdown(self, user=None, account_type=None, platform_name=None):
-        brk = {}
-        for u in self.users():
-            if user is None or user == u:
-                b = self.portfolio(u).region_breakdown(account_type, platform_name)
-                for k in b.keys():
-                    if k not in brk.keys():
-                        brk[k] = 0.0
-                    brk[k] += b[k]
-        return brk
+        return self.summary(user, account_type, platform_name).region_breakdown()
+
+    # Sector and parent sector totals of the filtered accounts
+    def sector_rollup(self, user=None, account_type=None, platform_name=None):
+        return self.summary(user, account_type, platform_name).sector_rollup()
 
     def sector_breakdown(self, user=None, account_type=None, platform_name=None):
-        brk = {}
-        for u in self.users():
-            if user is None or user == u:
-                b = self.portfolio(u).sector_breakdown(account_type, platform_name)
-                for k in b.keys():
-                    if k not in brk.keys():
-                        brk[k] = 0.0
-                    brk[k] += b[k]
-        return brk
+        return self.sector_rollup(user, account_type, platform_name)[0]
 
     def parent_sector_breakdown(self, user=None, account_type=None, platform_name=None):
-        brk = {}
-        for u in self.users():
-            if user is None or user == u:
-                b = self.portfolio(u).parent_sector_breakdown(account_type, platform_name)
-                for k in b.keys():
-                    if k not in brk.keys():
-                        brk[k] = 0.0
-                    brk[k] += b[k]
-        return brk
+        return self.sector_rollup(user, account_type, platform_name)[1]
+
+    def lookthrough_sector_breakdown(self, user=None, account_type=None, platform_name=None):
+        return SectorLookThrough(self.positions(user, account_type, platform_name)).breakdown()
+
+    # Look-through sector exposure by account, user and for the household
+    def sector_exposure_report(self, user=None, account_type=None, platform_name=None):
+        return SectorLookThrough(self.positions(user, account_type, platform_name)).report()
 
 
     # ====== Data ======
@@ -284,13 +358,14 @@ class UserPortfolioGroup():
     def data_asset_class_split(self, user=None, account_type=None):
         data = {}
 
+        values = self.asset_class_values(user, account_type)
         data['Asset Allocation'] = 'Value'
-        data['Equities'] = self.equity_value(user, account_type)
-        data['Bonds'] = self.bond_value(user, account_type)
-        data['Infrastructure'] = self.infrastructure_value(user, account_type)
-        data['Property'] = self.property_value(user, account_type)
-        data['Commodities'] = self.commodity_value(user, account_type)
-        data['Cash'] = self.cash_value(user, account_type)
+        data['Equities'] = values['equity']
+        data['Bonds'] = values['bond']
+        data['Infrastructure'] = values['infrastructure']
+        data['Property'] = values['property']
+        data['Commodities'] = values['commodities']
+        data['Cash'] = values['cash']
 
         return data
 
@@ -304,6 +379,16 @@ class UserPortfolioGroup():
 
         return data
 
+    def data_lookthrough_sector_split(self, user=None, account_type=None):
+        data = {}
+
+        data['Sector Exposure'] = 'Value'
+        b = self.lookthrough_sector_breakdown(user, account_type)
+        for k in b.keys():
+            data[k] = b[k]
+
+        return data
+
     def data_parent_sector_split(self, user=None, account_type=None):
         data = {}
         sl = parent_sector_list()
@@ -325,7 +410,7 @@ class UserPortfolioGroup():
     # General list routine (account level)
     def tdl_account_general(self, fn, username=None, account_type=None, platform_name=None):
         poslist = []
-        total = 0.0
+        total = 0
         currentUser = currentType = None
 
         # Process each account meeting the filter criteria
@@ -341,18 +426,19 @@ class UserPortfolioGroup():
             else:
                 disptype = ""
 
+            # Amounts in pence
             if fn == "value":
-                value = account.value()
+                value = account.value_pence()
             elif fn == "income":
-                value = account.annual_income()
+                value = to_pence(account.annual_income())
             else:
-                value = 0.0
+                value = 0
                 assert False, "Unknown value for 'fn' (%s)" % (fn)
 
             id = "%s_%s_%s" % (currentUser, currentType, account.platform())
 
-            vdate = datetime.datetime.strptime(account.vdate(), '%Y%m%d').strftime('%d-%b-%Y')
-            strvalue = "£ %12s" % ("{0:,.2f}".format(value))
+            vdate = format_day(account.vdate(), '%d-%b-%Y')
+            strvalue = "£ %12s" % (format_pence(value))
             poslist.append({'user': dispuser,
                              'type': disptype,
                              'platform': account.platform(True),
@@ -361,7 +447,7 @@ class UserPortfolioGroup():
                              'id': id})
             total += value
 
-        strvalue = "£ %12s" % ("{0:,.2f}".format(total))
+        strvalue = "£ %12s" % (format_pence(total))
         poslist.append({'user': "", 'type': "", 'platform': 'Total', 'value': strvalue, 'vdate': None, 'id': None})
         return poslist
 
@@ -369,7 +455,7 @@ class UserPortfolioGroup():
     def tdl_position_general(self, fn, username=None, account_type=None, platform_name=None, asset_class=None):
         logging.debug("tdl_position_general(%s,%s,%s,%s,%s" % (fn, username, account_type, platform_name, asset_class))
         poslist = []
-        total = 0.0
+        total = 0
         currentUserAccount = None
 
         for pos in self.positions(username, account_type, platform_name):
@@ -402,11 +488,12 @@ class UserPortfolioGroup():
             else:
                 assert False, "Unknown value for 'fn' (%s)" % (fn)
 
-            total += value
-            strvalue = "£ %12s" % ("{0:,.2f}".format(value))
+            pence = pos.value_pence() if fn in ("value","value2") and asset_class is None else to_pence(value)
+            total += pence
+            strvalue = "£ %12s" % (format_pence(pence))
 
             if asset_class is None:
-                vdate = datetime.datetime.strptime(pos.vdate(),'%Y%m%d').strftime('%d-%b-%Y')
+                vdate = format_day(pos.vdate(), '%d-%b-%Y')
                 poslist.append({'id': pos.sname(), 'name': pos.lname(), 'value': strvalue, 'vdate': vdate})
             elif value != 0.0:
                 tmpUserAccount = "%s %s %s" % (pos.username(), pos.platform(), pos.account_type(True))
@@ -420,7 +507,7 @@ class UserPortfolioGroup():
                 poslist.append({'useraccount': dispUserAccount, 'id': pos.sname(), 'name': posname, 'percentage': stralloc, 'value': strvalue})
 
         if fn != "value2":
-            strvalue = "£ %12s" % ("{0:,.2f}".format(total))
+            strvalue = "£ %12s" % (format_pence(total))
             if asset_class is None:
                 poslist.append({'id': None, 'name': "Total", 'value': strvalue, 'vdate': None})
             else:
@@ -438,66 +525,69 @@ class UserPortfolioGroup():
         mtotals = {}
 
         if fn in ("payments", "mpayments"):
-            events = self.dividend_payments(username, account_type, platform_name)
+            info = 'PAYMENTS'
         elif fn in ("declarations", "mdeclarations"):
-            events = self.dividend_declarations(username, account_type, platform_name)
+            info = 'DECLARATIONS'
         else:
             assert False, "Unknown value for 'fn' (%s)" % (fn)
 
-        ythis = datetime.datetime.today().strftime('%Y')
+        ythis = datetime.date.today().year
         total = 0.0
 
-        currentYear = currentMonth = None
-        for dt in sorted(events.keys(), reverse=True):
-            dispYear = dispMonth = None
-            try:
-                divYear = datetime.datetime.strptime(dt, '%Y%m%d').strftime('%Y')
-            except:
-                logging.error("Bad Date '%s'", dt)
-                divYear = datetime.datetime.strptime(dt, '%Y%m%d').strftime('%Y')
-            if currentYear is None or currentYear != divYear:
-                dispYear = currentYear = divYear
-            divMonth = datetime.datetime.strptime(dt, '%Y%m%d').strftime('%b')
-            if currentMonth is None or currentMonth != divMonth:
-                dispMonth = currentMonth = divMonth
-
-            # Total for YYYYMM
-            mkey = datetime.datetime.strptime(dt, '%Y%m%d').strftime('%Y%m')
-            if mkey not in ymtotals.keys():
-                ymtotals[mkey] = 0.0
-            if currentMonth not in mtotals.keys():
-                mtotals[currentMonth] = {'yprev': 0.0, 'ythis': 0.0, 'ynext': 0.0, 'total': 0.0}
-
-            for p in events[dt]:
-                vdate = datetime.datetime.strptime(dt, '%Y%m%d').strftime('%d-%b-%Y')
-                strvalue = "£ %12s" % ("{0:,.2f}".format(p['amount']))
-                ymtotals[mkey] += p['amount']
-                mtotals[currentMonth]['total'] += p['amount']
-                total += p['amount']
-
-                if divYear < ythis:
-                    mtotals[currentMonth]['yprev'] += p['amount']
-                elif divYear > ythis:
-                    mtotals[currentMonth]['ynext'] += p['amount']
-                else:
-                    mtotals[currentMonth]['ythis'] += p['amount']
+        # Events arrive latest first; date fields change only with the day
+        currentYear = currentMonth = currentDay = None
+        for ev in self.dividend_events(info, username, account_type, platform_name, reverse=True):
+            if ev.day != currentDay:
+                currentDay = ev.day
+                dispYear = dispMonth = None
+                divDate = day_date(ev.day)
+                divYear = divDate.year
+                if currentYear is None or currentYear != divYear:
+                    currentYear = divYear
+                    dispYear = str(divYear)
+                divMonth = divDate.strftime('%b')
+                if currentMonth is None or currentMonth != divMonth:
+                    dispMonth = currentMonth = divMonth
+
+                # Total for YYYYMM
+                mkey = divYear * 100 + divDate.month
+                if mkey not in ymtotals.keys():
+                    ymtotals[mkey] = 0.0
+                if currentMonth not in mtotals.keys():
+                    mtotals[currentMonth] = {'yprev': 0.0, 'ythis': 0.0, 'ynext': 0.0, 'total': 0.0}
+
+                vdate = divDate.strftime('%d-%b-%Y')
+
+            strvalue = "£ %12s" % ("{0:,.2f}".format(ev.amount))
+            ymtotals[mkey] += ev.amount
+            mtotals[currentMonth]['total'] += ev.amount
+            total += ev.amount
+
+            if divYear < ythis:
+                mtotals[currentMonth]['yprev'] += ev.amount
+            elif divYear > ythis:
+                mtotals[currentMonth]['ynext'] += ev.amount
+            else:
+                mtotals[currentMonth]['ythis'] += ev.amount
 
-                if fn in ("payments","declarations"):
-                    dlist.append({'year': dispYear, 'month': dispMonth,
-                              'username': p['username'],
-                              'acctype': p['acctype'],
-                              'platform': p['platform'],
-                              'name': p['secname'], 'id': p['secid'],
-                              'value': strvalue, 'date': vdate})
+            if fn in ("payments","declarations"):
+                pos = ev.position
+                account = pos.account()
+                dlist.append({'year': dispYear, 'month': dispMonth,
+                          'username': account.username(),
+                          'acctype': account.account_type(True),
+                          'platform': account.platform(True),
+                          'name': pos.lname(), 'id': pos.sname(),
+                          'value': strvalue, 'date': vdate})
 
-                    dispYear = dispMonth = None
+                dispYear = dispMonth = None
 
         if fn in ("mpayments", "mdeclarations"):
             currentYear = None
             mdisplayed = {}
             for mkey in sorted(ymtotals.keys(), reverse=True):
-                dispMonth = datetime.datetime.strptime(mkey, '%Y%m').strftime('%b')
-                dispYear  = datetime.datetime.strptime(mkey, '%Y%m').strftime('%Y')
+                dispMonth = datetime.date(mkey // 100, mkey % 100, 1).strftime('%b')
+                dispYear  = str(mkey // 100)
                 if currentYear is None or dispYear != currentYear:
                     currentYear = dispYear
                 else:
@@ -574,21 +664,17 @@ class UserPortfolioGroup():
 
     # ====== Representation ======
 
-    def repr_dividend_payments(self, username, account_type):
+    def repr_dividend_events(self, info, username, account_type):
         s = ""
-        payments = self.dividend_payments(username, account_type)
-        for dt in sorted(payments.keys()):
-            for p in payments[dt]:
-                s += "%s £ %8s  %s\n" % (dt, "{0:,.2f}".format(p['amount']), p['secname'])
+        for ev in self.dividend_events(info, username, account_type):
+            s += "%s £ %8s  %s\n" % (format_day(ev.day), "{0:,.2f}".format(ev.amount), ev.position.lname())
         return s
 
+    def repr_dividend_payments(self, username, account_type):
+        return self.repr_dividend_events('PAYMENTS', username, account_type)
+
     def repr_dividend_declarations(self, username, account_type):
-        s= ""
-        declarations = self.dividend_declarations(username, account_type)
-        for dt in sorted(declarations.keys()):
-            for p in declarations[dt]:
-                s += "%s £ %8s  %s\n" % (dt, "{0:,.2f}".format(p['amount']), p['secname'])
-        return s
+        return self.repr_dividend_events('DECLARATIONS', username, account_type)
 
     def __repr__(self):
         s = ""
@@ -0,0 +1,66 @@
+# Portfolio metrics pre-aggregated by user x account type x platform
+
+import logging
+
+from AccountClasses import account_key, filter_key, filter_match
+from AccountSummary import combine_summaries
+
+
+# Each account's AccountSummary (value, income, asset class, asset, region,
+# sector and parent sector totals) held in a cell for its (user, account
+# type, platform). A filtered query rolls up the matching cells once and is
+# then memoised, so repeated queries are a dict lookup. Adding, replacing or
+# removing an account recomputes only that account's summary and forgets
+# only the queries whose filter covers its cell.
+class PortfolioCube():
+    def __init__(self, accounts=()):
+        self._seq = 0
+        self._entries = {}
+        self._cells = {}
+        self._queries = {}
+        for acct in accounts:
+            self.add_account(acct)
+        logging.debug("PortfolioCube accounts=%d cells=%d" % (len(self._entries), len(self._cells)))
+
+    def cells(self):
+        return list(self._cells.keys())
+
+    def add_account(self, acct, seq=None):
+        key = account_key(acct)
+        if seq is None:
+            seq = self._seq
+            self._seq += 1
+        self._entries[id(acct)] = (seq, key, acct.summary())
+        self._cells.setdefault(key, []).append(id(acct))
+        self.invalidate(key)
+
+    def remove_account(self, acct):
+        seq, key, summary = self._entries.pop(id(acct))
+        self._cells[key].remove(id(acct))
+        if not self._cells[key]:
+            del self._cells[key]
+        self.invalidate(key)
+        return seq
+
+    # A reloaded account takes the place of the one it replaces
+    def replace_account(self, old, new):
+        self.add_account(new, self.remove_account(old))
+
+    # Forget queries covering a cell
+    def invalidate(self, cell):
+        for key in [key for key in self._queries.keys() if filter_match(key, cell)]:
+            del self._queries[key]
+
+    # Summary of the accounts matching the filter. Accounts are combined in
+    # the order they were added so breakdowns list names in position order.
+    def summary(self, user=None, account_type=None, platform_name=None):
+        key = filter_key(user, account_type, platform_name)
+        summary = self._queries.get(key)
+        if summary is None:
+            entries = []
+            for cell, ids in self._cells.items():
+                if filter_match(key, cell):
+                    entries.extend(self._entries[i] for i in ids)
+            entries.sort(key=lambda entry: entry[0])
+            summary = self._queries[key] = combine_summaries(entry[2] for entry in entries)
+        return summary
@@ -1,23 +1,19 @@
 # Define classes for handling positions, accounts and portfolios
 import logging
-from datetime import datetime, timedelta
-from decimal import Decimal
-
-from Breakdown import SectorAllocation
-
-def truncate_decimal(value, decimal_places=2):
-    # Create a Decimal object from the input value
-    d = Decimal(value)
-    
-    # Shift decimal point right, truncate, then shift back left
-    truncated = d.quantize(Decimal(f'1.{"0" * decimal_places}'), rounding="ROUND_DOWN")
-    
-    return truncated
 
+from Breakdown import SectorAllocation, ASSET_INDEX, REGION_INDEX, vector_totals
+from Dividends import project_forward
+from Dates import day_numbers
+from Money import to_pence, truncate_pence, to_pounds
 
 class Position:
+    __slots__ = ('_account', '_security', '_quantity', '_price', '_value', '_cost', '_vdate', '_sa', '_table', '_row', '_vectors')
+
     def __init__(self, security, quantity, price, value, cost, vdate):
         self._account = None
+        self._table = None
+        self._row = None
+        self._vectors = None
         self._security = security
         self._quantity = quantity
         self._price = price
@@ -32,6 +28,12 @@ class Position:
     def set_account(self, account):
         self._account = account
 
+    # Once attached to a PositionTable the position is a view of one of its rows
+    def attach(self, table, row):
+        self._table = table
+        self._row = row
+        self._quantity = self._price = self._value = self._cost = self._vdate = None
+
     def account(self):
         return self._account
 
@@ -44,6 +46,16 @@ class Position:
     def platform(self,fullname=False):
         return self._account.platform(fullname)
 
+    def security(self):
+        return self._security
+
+    # Point at a reloaded copy of the security
+    def set_security(self, security):
+        self._security = security
+        security.set_price(self.price())
+        self._sa = SectorAllocation(security.sector(), self.value())
+        self._vectors = None
+
     def sname(self):
         return self._security.sname()
 
@@ -59,6 +71,9 @@ class Position:
     def sector_amount(self):
         return self._sa.amount()
 
+    def sector_code(self):
+        return self._sa.code()
+
     def parent_sector(self):
         return self._sa.parent_sector()
 
@@ -66,19 +81,28 @@ class Position:
         return self._security.alias()
 
     def quantity(self):
-        return self._quantity
+        return self._quantity if self._table is None else self._table.cell('quantity', self._row)
 
     def price(self):
-        return self._price
+        return self._price if self._table is None else self._table.cell('price', self._row)
 
     def value(self):
-        return self._value
+        return self._value if self._table is None else to_pounds(self._table.cell('value', self._row))
+
+    def value_pence(self):
+        return to_pence(self._value) if self._table is None else self._table.cell('value', self._row)
 
     def cost(self):
-        return self._cost
+        return self._cost if self._table is None else to_pounds(self._table.cell('cost', self._row))
+
+    def cost_pence(self):
+        return to_pence(self._cost) if self._table is None else self._table.cell('cost', self._row)
 
     def vdate(self):
-        return self._vdate
+        return self._vdate if self._table is None else self._table.cell('vdate', self._row)
+
+    def allocation_row(self):
+        return self._security.allocation_row()
 
     def equity_allocation(self):
         return self._security.allocation_equity()
@@ -116,17 +140,27 @@ class Position:
     def cash_value(self):
         return self.cash_allocation() * self.value() / 100.0
 
+    # Breakdown vectors scaled by value, cached until the security's breakdown changes
+    def breakdown_vectors(self):
+        brk = self._security.brk
+        if self._vectors is None or self._vectors[0] is not brk:
+            value = self.value()
+            asset_ids, asset_pcts = brk.asset_vector()
+            region_ids, region_pcts = brk.region_vector()
+            self._vectors = (brk, (asset_ids, asset_pcts * value / 100.0), (region_ids, region_pcts * value / 100.0))
+        return self._vectors
+
+    def asset_vector(self):
+        return self.breakdown_vectors()[1]
+
+    def region_vector(self):
+        return self.breakdown_vectors()[2]
+
     def asset_breakdown(self):
-        brk = self._security.asset_breakdown().copy()
-        for k in brk.keys():
-            brk[k] = brk[k] * self.value() / 100.0
-        return brk
+        return vector_totals(ASSET_INDEX, [self.asset_vector()])
 
     def region_breakdown(self):
-        brk = self._security.region_breakdown().copy()
-        for k in brk.keys():
-            brk[k] = brk[k] * self.value() / 100.0
-        return brk
+        return vector_totals(REGION_INDEX, [self.region_vector()])
 
     def payout_frequency(self):
         return self._security.payout_frequency()
@@ -135,58 +169,24 @@ class Position:
         return self.quantity() * self._security.annual_dividend() / 100.0
 
     def dividend_payments(self):
-        payments = {}
         dp = self._security.dividend_payments()
         logging.debug("dividend_payments(%s)=%s"%(self.sname(),dp))
-        if dp:
-            for dt in dp.keys():
-                if dt not in payments.keys():
-                    payments[dt] = 0.0
-
-                payments[dt] += self.quantity() * dp[dt] / 100.0
-
-        return payments
+        return {dt: self.quantity() * amount / 100.0 for dt, amount in dp.items()}
 
     def dividend_declarations(self):
-        payments = {}
         dp = self._security.dividend_declarations()
-        if dp:
-            for dt in dp.keys():
-                if dt not in payments.keys():
-                    payments[dt] = 0.0
-
-                payments[dt] += self.quantity() * dp[dt] / 100.0
-
-        return payments
+        return {dt: self.quantity() * amount / 100.0 for dt, amount in dp.items()}
 
     # Return dict of projected dividend payments
     def projected_dividends(self, end_projection=None):
-        if end_projection is None:
-            end_projection = datetime.today() + timedelta(weeks=13)
-        
-        projected = []
         # Actual payments in pounds sterling from position
-        dp = self.dividend_payments()
-        for dt in dp.keys():
-            dt_obj = datetime.strptime(dt, "%Y%m%d")
-            if dt_obj >= datetime.today():
-                div_type = " * "
-                div_date = dt
-            else:
-                # Assume same dividend will be paid in a year
-                try:
-                    dt_obj = dt_obj.replace(year=dt_obj.year + 1)
-                except ValueError:
-                    dt_obj = dt_obj.replace(month=2, day=28, year=dt_obj.year + 1)
-
-                if dt_obj < datetime.today() or dt_obj > end_projection:
-                    continue
-
-                div_type = "Est"
-                div_date = dt_obj.strftime("%Y%m%d")
-
-            amount = float(truncate_decimal(dp[dt]))
-            projected.append({'type':div_type, 'payment':div_date, 'amount':amount, 'unit':'£'})
+        dates, amounts = self._security.payment_amounts()
+        idx, dates, future = project_forward(dates, end_projection)
+        amounts = to_pounds(truncate_pence(self.quantity() * amounts[idx] / 100.0))
+
+        projected = []
+        for div_date, amount, is_future in zip(day_numbers(dates).tolist(), amounts.tolist(), future):
+            projected.append({'type':" * " if is_future else "Est", 'payment':div_date, 'amount':amount, 'unit':'£'})
 
         return projected
 
@@ -0,0 +1,169 @@
+# All positions held as columns so aggregates are array reductions
+
+import logging
+import numpy as np
+
+from Breakdown import ASSET_CLASSES, asset_class_amounts, asset_class_totals, sector_taxonomy
+from Money import to_pounds
+
+
+# Code for each value in a list of distinct values, extending the list as needed
+def category_code(values, codes, value):
+    if value not in codes:
+        codes[value] = len(values)
+        values.append(value)
+    return codes[value]
+
+
+# Positions of a set of accounts as arrays with one row per position. Each
+# account's positions are a contiguous slice of rows. The accounts and their
+# positions are attached to the table so their accessors read from it.
+class PositionTable():
+    # Category codes of each row, then the position columns. value and cost
+    # are whole pence.
+    DTYPES = {'account': np.int32, 'user': np.int16, 'account_type': np.int16, 'platform': np.int16, 'security': np.int32,
+              'quantity': float, 'price': float, 'value': np.int64, 'cost': np.int64, 'vdate': np.int64}
+    COLUMNS = ('quantity', 'price', 'value', 'cost', 'vdate')
+
+    def __init__(self, accounts):
+        self._accounts = list(accounts)
+        self._users = []
+        self._account_types = []
+        self._platforms = []
+        self._securities = []
+        self._codes = {'user': {}, 'account_type': {}, 'platform': {}, 'security': {}}
+        self._sector = np.empty(0, dtype=np.intp)
+        self._allocation = np.empty((0, len(ASSET_CLASSES)))
+
+        positions = []
+        rows = []
+        for aid, acct in enumerate(self._accounts):
+            rows.append(self.account_rows(aid, acct))
+            acct.set_position_table(self, slice(len(positions), len(positions) + len(acct.positions())))
+            positions.extend(acct.positions())
+
+        self._columns = {}
+        for col, dtype in self.DTYPES.items():
+            self._columns[col] = np.concatenate([r[col] for r in rows]) if rows else np.empty(0, dtype=dtype)
+        for row, pos in enumerate(positions):
+            pos.attach(self, row)
+        self._positions = positions
+        logging.debug("PositionTable accounts=%d positions=%d securities=%d" % (len(self._accounts), len(positions), len(self._securities)))
+
+    # Code of a security, adding its sector and allocation rows if it is new
+    def security_code(self, sec):
+        codes = self._codes['security']
+        if sec not in codes:
+            self._sector = np.append(self._sector, sector_taxonomy().sector_code(sec.sector()))
+            self._allocation = np.vstack((self._allocation, sec.allocation_row()))
+        return category_code(self._securities, codes, sec)
+
+    # Columns (including the category codes) of one account's positions
+    def account_rows(self, aid, acct):
+        positions = acct.positions()
+        n = len(positions)
+        return {'account': np.full(n, aid, dtype=np.int32),
+                'user': np.full(n, category_code(self._users, self._codes['user'], acct.username()), dtype=np.int16),
+                'account_type': np.full(n, category_code(self._account_types, self._codes['account_type'], acct.account_type()), dtype=np.int16),
+                'platform': np.full(n, category_code(self._platforms, self._codes['platform'], acct.platform()), dtype=np.int16),
+                'security': np.array([self.security_code(pos.security()) for pos in positions], dtype=np.int32),
+                'quantity': np.array([pos.quantity() for pos in positions], dtype=float),
+                'price': np.array([pos.price() for pos in positions], dtype=float),
+                'value': np.array([pos.value_pence() for pos in positions], dtype=np.int64),
+                'cost': np.array([pos.cost_pence() for pos in positions], dtype=np.int64),
+                'vdate': np.array([pos.vdate() for pos in positions], dtype=np.int64)}
+
+    # Put a reloaded account in place of old. Only its rows are rebuilt; the
+    # rows after it move to make room, leaving other accounts' totals alone.
+    def replace_account(self, old, new):
+        aid = self._accounts.index(old)
+        rows = old.position_rows()
+        columns = self.account_rows(aid, new)
+        for col in self._columns.keys():
+            self._columns[col] = np.concatenate((self._columns[col][:rows.start], columns[col], self._columns[col][rows.stop:]))
+
+        positions = new.positions()
+        self._positions[rows] = positions
+        self._accounts[aid] = new
+        new.set_position_table(self, slice(rows.start, rows.start + len(positions)))
+        delta = len(positions) - (rows.stop - rows.start)
+        if delta:
+            for acct in self._accounts[aid + 1:]:
+                r = acct.position_rows()
+                acct.move_position_rows(slice(r.start + delta, r.stop + delta))
+        for row in range(rows.start, len(self._positions) if delta else rows.start + len(positions)):
+            self._positions[row].attach(self, row)
+        logging.debug("PositionTable.replace_account rows=%d->%d" % (rows.stop - rows.start, len(positions)))
+
+    def __len__(self):
+        return len(self._positions)
+
+    def accounts(self):
+        return self._accounts
+
+    def positions(self):
+        return self._positions
+
+    def column(self, name):
+        return self._columns[name]
+
+    # Replace securities reloaded by the universe ({id(old): new}) and
+    # recompute their sector and allocation rows
+    def replace_securities(self, replaced):
+        for code, sec in enumerate(self._securities):
+            new = replaced.get(id(sec))
+            if new is not None:
+                self._securities[code] = new
+                self._codes['security'][new] = self._codes['security'].pop(sec)
+                self._sector[code] = sector_taxonomy().sector_code(new.sector())
+                self._allocation[code] = new.allocation_row()
+
+    # Single value for a Position view
+    def cell(self, name, row):
+        return self._columns[name][row].item()
+
+    # Rows for the given user, account type(s) and platform. account_type
+    # matches as AccountGroup does, by 'in'.
+    def mask(self, user=None, account_type=None, platform_name=None):
+        mask = np.ones(len(self._positions), dtype=bool)
+        if user is not None:
+            mask &= self._columns['user'] == (self._users.index(user) if user in self._users else -1)
+        if account_type is not None:
+            allowed = np.array([t in account_type for t in self._account_types], dtype=bool)
+            mask &= allowed[self._columns['account_type']]
+        if platform_name is not None:
+            mask &= self._columns['platform'] == (self._platforms.index(platform_name) if platform_name in self._platforms else -1)
+        return mask
+
+    def total(self, name, rows=slice(None)):
+        return self._columns[name][rows].sum().item()
+
+    # Values are held in pence, summed exactly
+    def value_pence(self, rows=slice(None)):
+        return self.total('value', rows)
+
+    def value(self, rows=slice(None)):
+        return to_pounds(self.value_pence(rows))
+
+    # Value of each position in pounds
+    def values(self):
+        return to_pounds(self._columns['value'])
+
+    # Annual dividend (pence per share) of each security
+    def annual_dividends(self):
+        return np.array([sec.annual_dividend() for sec in self._securities], dtype=float)
+
+    def annual_income(self, rows=slice(None)):
+        income = self._columns['quantity'][rows] * self.annual_dividends()[self._columns['security'][rows]] / 100.0
+        return float(income.sum())
+
+    def asset_class_values(self, rows=slice(None)):
+        return asset_class_totals(self.values()[rows], self._allocation[self._columns['security'][rows]])
+
+    # As asset_class_values but an array in ASSET_CLASSES order
+    def asset_class_amounts(self, rows=slice(None)):
+        return asset_class_amounts(self.values()[rows], self._allocation[self._columns['security'][rows]])
+
+    # Totals by sector and parent sector (see SectorTaxonomy.rollup)
+    def sector_rollup(self, rows=slice(None)):
+        return sector_taxonomy().rollup(self._sector[self._columns['security'][rows]], self.values()[rows])
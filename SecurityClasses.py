@@ -1,34 +1,253 @@
 # Define classes for handling the different types of securities
 
 import os
-from datetime import datetime, timedelta
+import re
+import difflib
+from datetime import datetime
 import time
 import json
 import logging
+import pickle
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+from Breakdown import AssetAllocation, BreakdownStore, EMPTY_BREAKDOWN
+from Dividends import DividendSchedule, DividendEventIndex, project_forward, unit_name, days_overdue
+from Dates import date_array, day_numbers, day_array, format_day
+
+# Bump when the pickled layout of Security objects changes
+SNAPSHOT_VERSION = 17
+
+
+# Size and modification time used to decide whether a file has changed
+def file_signature(full_path):
+    try:
+        st = os.stat(full_path)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+# Columns of the universe table, taken from the json without building the security
+# The stale flag is derived from the oldest dates when the table is built.
+TABLE_COLUMNS = ['sname', 'lname', 'stype', 'alias', 'structure', 'sector',
+                 'ISIN', 'SEDOL', 'fund-class', 'div-freq', 'mdate',
+                 'oldest-exdiv', 'oldest-payment', 'stale']
+
+# Day number of the earliest YYYYMMDD date, None if there are none or any is missing
+def oldest_day(dates):
+    dates = date_array(dates)
+    if len(dates) == 0 or np.isnat(dates).any():
+        return None
+    return int(day_numbers(dates.min()))
+
+
+# Recorded dividends of a security definition, None if it has none
+def recorded_schedule(data):
+    try:
+        return DividendSchedule(data['divis']['prev'])
+    except:
+        return None
+
+
+# Static attributes needed to index and list a security without building it
+def security_header(data):
+    header = {k: data.get(k) for k in TABLE_COLUMNS}
+    try:
+        header['div-freq'] = data['divis']['freq']
+    except:
+        header['div-freq'] = None
+    try:
+        prev = data['divis']['prev']
+        header['oldest-exdiv'] = oldest_day([d.get('ex-div') for d in prev])
+        header['oldest-payment'] = oldest_day([d.get('payment') for d in prev])
+    except:
+        pass
+    header['urls'] = list(data['info'].items()) if 'info' in data else []
+    return header
+
+
+# Symbol normalisation rules applied in order when an exact lookup misses
+def norm_case(symbol):
+    return symbol.strip().upper()
+
+def norm_exchange_suffix(symbol):
+    return re.sub(r'\.[A-Z]{1,2}$', '', symbol)
+
+def norm_zero_pad(symbol):
+    return symbol.lstrip('0') if symbol.isdigit() else symbol
+
+DEFAULT_SYMBOL_RULES = [norm_case, norm_exchange_suffix, norm_zero_pad]
+
+
+class SecurityLookupError(LookupError):
+    def __init__(self, name, normalised=None, suggestions=None):
+        self.name = name
+        self.normalised = normalised
+        self.suggestions = suggestions if suggestions is not None else []
+        LookupError.__init__(self, "Security lookup(%s) normalised(%s) suggestions=%s" % (name, normalised, self.suggestions))
 
-from Breakdown import AssetAllocation, Breakdown
 
 class SecurityUniverse():
-    def __init__(self, SecurityInfoDir):
+    def __init__(self, SecurityInfoDir, workers=None, snapshot=None, lazy=False, rules=None):
         # self._rootdir = os.getenv('HOME') + '/SecurityInfo'
         self._rootdir = SecurityInfoDir
-        logging.debug("SecurityUniverse(%s)"%(SecurityInfoDir))
+        logging.debug("SecurityUniverse(%s,%s,%s,%s)"%(SecurityInfoDir,workers,snapshot,lazy))
+        self._lazy = lazy
+        self._rules = DEFAULT_SYMBOL_RULES if rules is None else rules
+        self._index = None
+        self._norm_index = None
+        self._misses = set()
         self._securities = {}
         self._aliases = {}
-        for filename in os.listdir(self._rootdir):
-            full_path = self._rootdir + '/' + filename
-            if os.path.isdir(full_path):
-                continue
-            sec = self.load_security(full_path)
-            self.add_security(sec.sname(), sec)
-            if sec.ISIN():
-                self.add_alias(sec.ISIN(), sec.sname())
-            if sec.SEDOL():
-                self.add_alias(sec.SEDOL(),sec.sname())
-            if sec.alias():
-                self.add_alias(sec.alias(), sec.sname())
-        
-    def securities(self):    
+        self._files = {}
+        self._load_times = {}
+        self._entries = {}
+        self._snapshot = snapshot
+        self._listeners = []
+        self._table = None
+        self._url_table = None
+        self._event_index = None
+        self._breakdowns = BreakdownStore()
+
+        # Reuse entries and parsed breakdowns from the snapshot where neither
+        # the json nor breakdown file has changed. Entries saved by a lazy
+        # universe hold no Security, so are loaded again unless this one is lazy.
+        data = self.load_snapshot(snapshot)
+        cached = data.get('entries', {})
+        files = self.scan_files()
+        self._breakdowns.restore(data.get('breakdowns'))
+        bchanged = self._breakdowns.refresh(workers)
+        bsigs = self._breakdowns.signatures()
+        changed = []
+        for full_path, sig in files.items():
+            entry = cached.get(full_path)
+            if (entry is not None and entry['sig'] == sig and entry['bsig'] == bsigs.get(entry['header']['sname'])
+                    and (self._lazy or entry['security'] is not None)):
+                self._entries[full_path] = entry
+            else:
+                changed.append((full_path, sig))
+
+        logging.debug("SecurityUniverse %d cached %d to load"%(len(files)-len(changed), len(changed)))
+        self.load_entries(changed, bsigs, workers)
+
+        # Sorted so securities and aliases are merged in the same order however they are loaded
+        for full_path in files.keys():
+            self.register_entry(full_path)
+
+        if snapshot is not None and (changed or bchanged or len(cached) != len(self._entries)):
+            self.save_snapshot(snapshot)
+
+    # Security files and their signatures, sorted by path
+    def scan_files(self):
+        files = {}
+        with os.scandir(self._rootdir) as it:
+            for entry in it:
+                if not entry.is_dir():
+                    st = entry.stat()
+                    files[self._rootdir + '/' + entry.name] = (st.st_size, st.st_mtime_ns)
+        return dict(sorted(files.items()))
+
+    # Parsed breakdown files shared by the securities
+    def breakdowns(self):
+        return self._breakdowns
+
+    # Load the given (path, signature) pairs. In lazy mode only the header is
+    # read now; the Security is built on first lookup.
+    def load_entries(self, changed, bsigs, workers=None):
+        paths = [c[0] for c in changed]
+        if self._lazy:
+            loaded = self.load_headers(paths, workers)
+        else:
+            loaded = self.load_securities(paths, workers)
+
+        for (full_path, sig), item in zip(changed, loaded):
+            if self._lazy:
+                header, sec = item, None
+            else:
+                header, sec = security_header(item.data()), item
+            bsig = bsigs.get(header['sname'])
+            self._entries[full_path] = {'sig': sig, 'bsig': bsig, 'header': header, 'security': sec}
+
+    def register_entry(self, full_path):
+        entry = self._entries[full_path]
+        header = entry['header']
+        sname = header['sname']
+        self._files[sname] = full_path
+        if entry['security'] is not None:
+            # Securities from a snapshot carry their own copy of the breakdown
+            entry['security'].set_breakdown(self._breakdowns.breakdown(sname))
+            self.add_security(sname, entry['security'])
+        for tag in ['ISIN', 'SEDOL', 'alias']:
+            if header[tag]:
+                self.add_alias(header[tag], sname)
+        self.clear_index()
+        self._table = self._url_table = None
+
+    def unregister_entry(self, full_path, entry):
+        header = entry['header']
+        sname = header['sname']
+        if self._files.get(sname) == full_path:
+            del self._files[sname]
+            self._securities.pop(sname, None)
+        for tag in ['ISIN', 'SEDOL', 'alias']:
+            if header[tag] and self._aliases.get(header[tag]) == sname:
+                del self._aliases[header[tag]]
+        self.clear_index()
+        self._table = self._url_table = None
+
+    # Called with the set of snames changed by each refresh()
+    def add_listener(self, fn):
+        self._listeners.append(fn)
+
+    # Reload only security and breakdown files added, changed or removed since
+    # they were last loaded. Returns the set of snames affected.
+    def refresh(self, workers=None):
+        files = self.scan_files()
+        self._breakdowns.refresh(workers)
+        bsigs = self._breakdowns.signatures()
+
+        removed = [full_path for full_path in self._entries.keys() if full_path not in files]
+        changed = []
+        for full_path, sig in files.items():
+            entry = self._entries.get(full_path)
+            if entry is None or entry['sig'] != sig or entry['bsig'] != bsigs.get(entry['header']['sname']):
+                changed.append((full_path, sig))
+
+        snames = set()
+        for full_path in removed + [c[0] for c in changed]:
+            entry = self._entries.pop(full_path, None)
+            if entry is not None:
+                snames.add(entry['header']['sname'])
+                self.unregister_entry(full_path, entry)
+
+        self.load_entries(changed, bsigs, workers)
+        for full_path, sig in changed:
+            snames.add(self._entries[full_path]['header']['sname'])
+            self.register_entry(full_path)
+
+        logging.debug("refresh() removed=%d changed=%d snames=%s"%(len(removed), len(changed), sorted(snames)))
+        if self._event_index is not None:
+            for sname in snames:
+                self.index_events(sname)
+        if snames:
+            self._files = dict(sorted(self._files.items(), key=lambda item: item[1]))
+            self._securities = {name: self._securities[name] for name in self._files.keys() if name in self._securities}
+            self._entries = dict(sorted(self._entries.items()))
+            if self._snapshot is not None:
+                self.save_snapshot(self._snapshot)
+            for fn in self._listeners:
+                fn(snames)
+
+        return snames
+
+    # All securities, building any not yet loaded in lazy mode
+    def securities(self):
+        if len(self._securities) < len(self._files):
+            for name in self._files.keys():
+                self.security(name)
+            self._securities = {name: self._securities[name] for name in self._files.keys()}
         return self._securities
     
     def aliases(self):
@@ -39,14 +258,137 @@ class SecurityUniverse():
 
     def add_alias(self, alias, name):
         self._aliases[alias] = name
+        self.clear_index()
+
+    # Symbol index and misses are rebuilt on the next lookup
+    def clear_index(self):
+        self._index = None
+        self._norm_index = None
+        self._misses = set()
 
     def security_names(self):
-        return self._securities.keys()
+        return self._files.keys()
 
     def alias_names(self):
         return self._aliases.keys()
 
-    def load_security(self, full_path):
+    # Security by its sname, built from its file on first use
+    def security(self, name):
+        if name not in self._securities:
+            full_path = self._files[name]
+            sec = self.timed_load_security(full_path)
+            self._entries[full_path]['security'] = sec
+            self.add_security(name, sec)
+        return self._securities[name]
+
+    def normalise_symbol(self, symbol):
+        symbol = str(symbol)
+        for rule in self._rules:
+            symbol = rule(symbol)
+        return symbol
+
+    # Map every sname, ISIN, SEDOL and alias (exact and normalised) to its sname
+    def build_index(self):
+        index = {}
+        for name in self._files.keys():
+            index[name] = name
+        for alias, name in self._aliases.items():
+            index.setdefault(alias, name)
+
+        norm_index = {}
+        ambiguous = set()
+        for key, name in index.items():
+            norm = self.normalise_symbol(key)
+            if norm_index.setdefault(norm, name) != name:
+                ambiguous.add(norm)
+        for norm in ambiguous:
+            logging.debug("build_index: ambiguous normalised symbol (%s)"%(norm))
+            del norm_index[norm]
+
+        self._index = index
+        self._norm_index = norm_index
+        self._misses = set()
+
+    # sname for a raw symbol, or None if it cannot be resolved
+    def resolve(self, symbol):
+        if self._index is None:
+            self.build_index()
+        try:
+            return self._index[symbol]
+        except (KeyError, TypeError):
+            pass
+        if symbol in self._misses:
+            return None
+        name = self._norm_index.get(self.normalise_symbol(symbol))
+        if name is None:
+            self._misses.add(symbol)
+        return name
+
+    # Yield/dividend cache hits and misses summed over the securities built so far
+    def cache_stats(self):
+        stats = {'hits': 0, 'misses': 0}
+        for sec in self._securities.values():
+            for k, v in sec.cache_stats().items():
+                stats[k] += v
+        return stats
+
+    # Number of securities built so far (all of them unless lazy)
+    def loaded_count(self):
+        return len(self._securities)
+
+    # Compiled securities (keyed by file path) and parsed breakdowns from a
+    # previous run. Empty if unusable.
+    def load_snapshot(self, snapshot):
+        if snapshot is None or not os.path.isfile(snapshot):
+            return {}
+        try:
+            with open(snapshot, 'rb') as fp:
+                data = pickle.load(fp)
+            if data['version'] == SNAPSHOT_VERSION and data['rootdir'] == self._rootdir:
+                return data
+            logging.info("Ignoring snapshot %s (version or directory mismatch)"%(snapshot))
+        except Exception as e:
+            logging.warning("Ignoring snapshot %s (%s)"%(snapshot, e))
+        return {}
+
+    # Write the compiled universe so the next run only re-parses changed files
+    def save_snapshot(self, snapshot):
+        os.makedirs(os.path.dirname(snapshot) or '.', exist_ok=True)
+        data = {'version': SNAPSHOT_VERSION, 'rootdir': self._rootdir, 'entries': self._entries, 'breakdowns': self._breakdowns.state()}
+        tmpfile = snapshot + '.tmp'
+        with open(tmpfile, 'wb') as fp:
+            pickle.dump(data, fp, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmpfile, snapshot)
+        logging.debug("save_snapshot(%s) %d securities"%(snapshot, len(self._entries)))
+
+    # Time taken (seconds) to load each security file
+    def load_times(self):
+        return self._load_times
+
+    # Load security files, optionally using a pool of worker threads.
+    # Results are returned in the same order as the list of paths.
+    def load_securities(self, paths, workers=None):
+        if workers is None or workers <= 1:
+            return [self.timed_load_security(full_path) for full_path in paths]
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(self.timed_load_security, paths))
+
+    def load_headers(self, paths, workers=None):
+        if workers is None or workers <= 1:
+            return [security_header(self.read_security_file(full_path)) for full_path in paths]
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return [security_header(data) for data in pool.map(self.read_security_file, paths)]
+
+    def timed_load_security(self, full_path):
+        start = time.perf_counter()
+        security = self.load_security(full_path)
+        self._load_times[full_path] = time.perf_counter() - start
+        logging.debug("load_security(%s) %.3fms"%(full_path, self._load_times[full_path] * 1000.0))
+        return security
+
+    def read_security_file(self, full_path):
         with open(full_path, 'r', encoding='utf-8-sig') as fp:
             try:
                 data = json.load(fp)
@@ -54,6 +396,10 @@ class SecurityUniverse():
             except:
                 print("ERROR:%s" % (full_path))
                 exit(1)
+        return data
+
+    def load_security(self, full_path):
+        data = self.read_security_file(full_path)
 
         if data["structure"] == "EQ":
             security = Equity(data)
@@ -73,50 +419,162 @@ class SecurityUniverse():
             security = None
             assert True, "Unknown security structure (%s)"%(data["structure"])
 
+        if security is not None:
+            security.set_breakdown(self._breakdowns.breakdown(security.sname()))
         return security
 
     def find_security(self, name):
-        if name in self.security_names():
-            return (self._securities[name])
-        elif name in self.alias_names():
-            secname = self._aliases[name]
-            return (self._securities[secname])
+        secname = self.resolve(name)
+        if secname is None:
+            norm = self.normalise_symbol(name)
+            suggestions = difflib.get_close_matches(norm, self._norm_index.keys(), n=5)
+            raise SecurityLookupError(name, norm, [self._norm_index[k] for k in suggestions])
+        return self.security(secname)
+
+    # Resolve a whole column of raw symbols in one pass. Returns a Series of
+    # snames aligned with the input (NaN where unresolved) and a mask of misses.
+    def resolve_symbols(self, symbols):
+        if self._index is None:
+            self.build_index()
+        symbols = pd.Series(symbols)
+        snames = symbols.map(self._index)
+        unresolved = snames.isna()
+        if unresolved.any():
+            fallback = {sym: self.resolve(sym) for sym in symbols[unresolved].unique()}
+            snames[unresolved] = symbols[unresolved].map(fallback)
+            unresolved = snames.isna()
+        return snames, unresolved
+
+    # Security objects for a column of raw symbols, failing on the first miss
+    def find_securities(self, symbols):
+        snames, unresolved = self.resolve_symbols(symbols)
+        if unresolved.any():
+            self.find_security(pd.Series(symbols)[unresolved].iloc[0])
+        return [self.security(name) for name in snames]
+
+    # Static attributes of every security as a DataFrame, one row per security.
+    # The stale flag is recalculated when the date changes.
+    def table(self, structure=None):
+        if self._table is None:
+            rows = [self._entries[full_path]['header'] for full_path in self._files.values()]
+            self._table = pd.DataFrame(rows, columns=TABLE_COLUMNS)
+            self._table_date = None
+        if self._table_date != datetime.today().date():
+            self._table_date = datetime.today().date()
+            self._table['stale'] = self.days_overdue() > np.timedelta64(0, 'D')
+        if structure is None:
+            return self._table
+        return self._table[self._table['structure'] == structure]
+
+    # Information URLs for every security, one row per URL
+    def url_table(self):
+        if self._url_table is None:
+            rows = []
+            for full_path in self._files.values():
+                header = self._entries[full_path]['header']
+                for platform, url in header['urls']:
+                    rows.append((header['sname'], platform, url))
+            self._url_table = pd.DataFrame(rows, columns=['SecurityId', 'Platform', 'Url'])
+        return self._url_table
+
+    # Recorded dividends of a security, taken from the Security where it has
+    # been built and otherwise compiled from its file
+    def recorded_schedule(self, sname):
+        sec = self._securities.get(sname)
+        if sec is not None:
+            return sec.divi_schedule() if sec.has_prev_divis() else None
+        return recorded_schedule(self.read_security_file(self._files[sname]))
+
+    # Index of every recorded dividend event by payment and ex-div date
+    def event_index(self):
+        if self._event_index is None:
+            self._event_index = DividendEventIndex()
+            entries = []
+            for sname, full_path in self._files.items():
+                header = self._entries[full_path]['header']
+                entries.append((sname, self.recorded_schedule(sname), header['structure'], header['div-freq']))
+            self._event_index.add_many(entries)
+        return self._event_index
+
+    def index_events(self, sname):
+        if sname in self._files:
+            header = self._entries[self._files[sname]]['header']
+            self._event_index.add(sname, self.recorded_schedule(sname), header['structure'], header['div-freq'])
         else:
-            print("security_names=%s"%(self.security_names()))
-            print("alias_names=%s"%(self.alias_names()))
-            errstr = "ERROR: Security lookup(%s)" % (name)
-            assert False, errstr
+            self._event_index.remove(sname)
+
+    # Dividends going ex (key='ex-div') or paid (key='payment') between two dates inclusive
+    def dividend_events(self, start, end, key='payment', snames=None, structure=None, freq=None):
+        return self.event_index().query(start, end, key, snames, structure, freq)
+
+    # Days by which each security's oldest recent dividend is more than a year before asof
+    def days_overdue(self, asof=None):
+        df = self.table()
+        oldest = np.fmin(day_array(df['oldest-exdiv']), day_array(df['oldest-payment']))
+        return days_overdue(oldest, asof)
+
+    # Securities with a recent dividend more than a year before asof (default today),
+    # most overdue first
+    def stale_report(self, asof=None):
+        df = self.table()
+        overdue = self.days_overdue(asof)
+        stale = overdue > np.timedelta64(0, 'D')
+        report = df.loc[stale, ['sname', 'lname', 'structure', 'oldest-exdiv', 'oldest-payment']].copy()
+        report['days-overdue'] = overdue[stale].astype(int)
+        for col in ['oldest-exdiv', 'oldest-payment']:
+            report[col] = [None if pd.isna(d) else format_day(d) for d in report[col]]
+        return report.sort_values(['days-overdue', 'sname'], ascending=[False, True]).reset_index(drop=True)
 
     def list_securities(self, structure=None):
-        seclist = []
-
-        for name in sorted(self.security_names()):
-            sec = self._securities[name]
-            if structure is None or structure == sec.structure():
-                seclist.append(sec.tdl_security())
-
-        return seclist
+        df = self.table(structure).sort_values('sname')
+        df = pd.DataFrame({'id': df['sname'],
+                           'name': df['lname'],
+                           'structure': df['structure'],
+                           'mdate': df['mdate'],
+                           'stale': df['stale'].map({True: 'Yes', False: 'No'})})
+        return df.to_dict('records')
 
 
 class Security:
+    __slots__ = ('_data', '_sname', '_lname', '_sector', '_structure', '_ISIN', '_SEDOL', '_alias',
+                 'aa', 'brk', '_price', '_schedule', '_cache', '_cache_hits', '_cache_misses')
+
     def __init__(self, data):
         self._data = data
+        # Fields used on hot paths are extracted once
+        self._sname = data['sname']
+        self._lname = data['lname']
+        self._sector = data['sector']
+        self._structure = data.get('structure')
+        self._ISIN = data.get('ISIN')
+        self._SEDOL = data.get('SEDOL')
+        self._alias = data.get('alias')
         self.aa = AssetAllocation(self.sector(), 100.0, self.security_aa())
-        self.brk = Breakdown(self.sname())
+        self.brk = EMPTY_BREAKDOWN
         self._price = 0.0
-        self._stale = False
-
-        try:
-            now = datetime.now()
-            one_year_ago = "%04d%02d%02d" % (now.year-1, now.month, now.day)
-            for d in self._data['divis']['prev']:
-                if d['payment'] < one_year_ago or d['ex-div'] < one_year_ago:
-                    self._stale = True
-        except:
-            pass
+        self._schedule = None
+        self._cache = {}
+        self._cache_hits = 0
+        self._cache_misses = 0
 
         logging.debug("Security(%s)"%(self.sname()))
 
+    # Snapshots keep the definition and allocations only. The price, compiled
+    # schedule and memoised results belong to the process that set them.
+    RUNTIME_SLOTS = ('_price', '_schedule', '_cache', '_cache_hits', '_cache_misses')
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in Security.__slots__ if name not in Security.RUNTIME_SLOTS}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._price = 0.0
+        self._schedule = None
+        self._cache = {}
+        self._cache_hits = 0
+        self._cache_misses = 0
+
     # Optional definition of asset allocation specific to this security
     def security_aa(self):
         try:
@@ -171,101 +629,101 @@ class Security:
         except:
             return freq
 
-    # Return dict of payment dates with amounts
+    # Recent dividends compiled into arrays. Generated payments depend on
+    # today's date so are recompiled when the date changes.
+    def divi_schedule(self):
+        dt = datetime.today().date()
+        if self._schedule is None or (not self._schedule.actual() and self._schedule.compiled() != dt):
+            self._schedule = DividendSchedule(self.recent_divis(), self.has_prev_divis(), dt)
+            self.clear_cache()
+        return self._schedule
+
+    def has_prev_divis(self):
+        try:
+            return self._data['divis']['prev'] is not None
+        except:
+            return False
+
+    # Dividend per share for the given entries, estimated from the yield where no amount is given
+    def divi_amounts(self, idx):
+        amounts = self.divi_schedule().amount()[idx]
+        missing = np.isnan(amounts)
+        if missing.any():
+            amounts = np.where(missing, self.price() * self.fund_period_yield() / 100.0, amounts)
+        return amounts
+
+    # Distinct payment dates (datetime64) with the amount per share paid on each
+    def payment_amounts(self):
+        sched = self.divi_schedule()
+        return sched.payment()[sched.payment_index()], self.divi_amounts(sched.payment_index())
+
+    # Return dict of payment day numbers with amounts
     def dividend_payments(self):
-        payments = {}
-        for d in self.recent_divis():
-            if 'payment' in d.keys():
-                if 'amount' in d.keys():
-                    payments[d['payment']] = d['amount']
-                else:
-                    payments[d['payment']] = self.price() * self.fund_period_yield() / 100.0
-        return payments
+        sched = self.divi_schedule()
+        return dict(zip(sched.payment_keys(), self.divi_amounts(sched.payment_index()).tolist()))
 
-    # Return dict of projected dividend payments
+    # Return list of projected dividend payments, dated by day number
     def projected_dividends(self, end_projection=None):
-        if end_projection is None:
-            end_projection = datetime.today() + timedelta(weeks=13)
-        
-        projected = []
-        for divi in self.recent_divis():
-            dt = divi['payment']
-            dt_obj = datetime.strptime(dt, "%Y%m%d")
-            if dt_obj >= datetime.today():
-                div_type = " * "
-                div_date = dt
-            else:
-                # Assume same dividend will be paid in a year
-                try:
-                    dt_obj = dt_obj.replace(year=dt_obj.year + 1)
-                except ValueError:
-                    dt_obj = dt_obj.replace(month=2, day=28, year=dt_obj.year + 1)
-
-                if dt_obj < datetime.today() or dt_obj > end_projection:
-                    continue
-                
-                div_type = "Est"
-                div_date = dt_obj.strftime("%Y%m%d")
-
-            # Are previous dividends defined?
-            try:
-                prev = self._data['divis']['prev']
-            except:
-                prev = None
+        sched = self.divi_schedule()
+        idx, dates, future = project_forward(sched.payment(), end_projection)
 
-            if prev is None:
+        # Is the dividend calculated based on a yield (% of value) or price (qty * price)?
+        fund_yield = self._data['fund-yield'] if 'fund-yield' in self._data.keys() else 0.0
+        projected = []
+        for n, div_date, is_future in zip(idx, day_numbers(dates).tolist(), future):
+            unit = unit_name(sched.unit()[n]) if sched.actual() else None
+            if unit is None:
                 unit = '%'
-            else:
-                try:
-                    unit = divi['unit']
-                except:
-                    unit = '%'
-
-            # Is the dividend calculated based on a yield (% of value) or price (qty * price)?
             if unit == '%':
-                try:
-                    amount = self._data['fund-yield']
-                except:
-                    amount = 0.0
+                amount = fund_yield
             else:
-                try:
-                    amount = divi['amount']
-                except:
-                    amount = ''
+                amount = sched.amount()[n]
+                amount = '' if np.isnan(amount) else float(amount)
 
-            projected.append({'type':div_type, 'payment':div_date, 'amount':amount, 'unit':unit})
+            projected.append({'type':" * " if is_future else "Est", 'payment':div_date, 'amount':amount, 'unit':unit})
 
         return projected
 
-    # Return dict of ex-div dates with amounts
+    # Return dict of ex-div day numbers with amounts
     def dividend_declarations(self):
-        payments = {}
-        for d in self.recent_divis():
-            if 'ex-div' in d.keys():
-                if 'amount' in d.keys():
-                    payments[d['ex-div']] = d['amount']
-                else:
-                    payments[d['ex-div']] = self.price() * self.fund_period_yield() / 100.0
-        return payments
+        sched = self.divi_schedule()
+        return dict(zip(sched.exdiv_keys(), self.divi_amounts(sched.exdiv_index()).tolist()))
+
+    # Memoised value for key, computed by fn on a miss. Cleared when the
+    # price changes or the dividend schedule is recompiled.
+    def cached(self, key, fn):
+        try:
+            value = self._cache[key]
+            self._cache_hits += 1
+        except KeyError:
+            value = self._cache[key] = fn()
+            self._cache_misses += 1
+        return value
+
+    def clear_cache(self):
+        self._cache = {}
+
+    def cache_stats(self):
+        return {'hits': self._cache_hits, 'misses': self._cache_misses}
 
     # Sum of individual dividend paid in the last yesr
     def annual_dividend_amount(self):
-        amount = 0.0
-        for d in self.recent_divis():
-            if 'amount' in d.keys():
-                amount += d['amount']
-        return amount
+        return self.cached('annual_dividend_amount', lambda: float(np.nansum(self.divi_schedule().amount())))
 
     # Unit of annual dividend, e.g. pence or cents
     def annual_dividend_unit(self):
-        unit = ''
-        for d in self.recent_divis():
-            if 'unit' in d.keys():
-                unit = d['unit']
-        return unit
+        return self.cached('annual_dividend_unit', self.calc_annual_dividend_unit)
+
+    def calc_annual_dividend_unit(self):
+        units = self.divi_schedule().unit()
+        units = units[units != 0]
+        return unit_name(units[-1]) if len(units) else ''
 
     # Annual payout as a percentage of price
     def sec_yield(self):
+        return self.cached('sec_yield', self.calc_sec_yield)
+
+    def calc_sec_yield(self):
         annual_amount = self.annual_dividend_amount()
         if annual_amount > 0.0:
             try:
@@ -281,16 +739,22 @@ class Security:
 
     # Divide annual yield up equally between periods
     def fund_period_yield(self):
+        return self.cached('fund_period_yield', self.calc_fund_period_yield)
+
+    def calc_fund_period_yield(self):
         freq = self.payout_frequency()
-        np = {'A':1,'H':2,'Q':4,'M':12}
+        periods = {'A':1,'H':2,'Q':4,'M':12}
         try:
-            nperiods = np[freq]
+            nperiods = periods[freq]
             return self.sec_yield()/nperiods
         except:
             return 0.0
 
     # Amount paid out in last year - either sum dividend payments or based on price and yield
     def annual_dividend(self):
+        return self.cached('annual_dividend', self.calc_annual_dividend)
+
+    def calc_annual_dividend(self):
         annual_amount = self.annual_dividend_amount()
         if annual_amount <= 0.0:
             annual_amount = self.sec_yield() * self.price() / 100.0
@@ -300,10 +764,10 @@ class Security:
         return self._data
     
     def sname(self):
-        return self._data['sname']
+        return self._sname
 
     def lname(self):
-        return self._data['lname']
+        return self._lname
 
     def name(self):
         return self.lname()
@@ -315,34 +779,32 @@ class Security:
         return self._data['mdate']
 
     def ISIN(self):
-        if 'ISIN' in self._data.keys():
-            return self._data['ISIN']
-        else:
-            return None
+        return self._ISIN
 
     def SEDOL(self):
-        if 'SEDOL' in self._data.keys():
-            return self._data['SEDOL']
-        else:
-            return None
+        return self._SEDOL
 
     def alias(self):
-        if 'alias' in self._data.keys():
-            return self._data['alias']
-        else:
-            return None
+        return self._alias
 
     def price(self):
         return self._price
 
-    def is_stale(self):
-        return self._stale
+    # True if any recent dividend is more than a year before asof (default today)
+    def is_stale(self, asof=None):
+        sched = self.divi_schedule()
+        if not sched.actual() or len(sched) == 0:
+            return False
+        oldest = np.fmin(sched.exdiv().min(), sched.payment().min())
+        return bool(days_overdue(oldest, asof) > np.timedelta64(0, 'D'))
 
     def set_price(self, price):
+        if price != self._price:
+            self.clear_cache()
         self._price = price
 
     def sector(self):
-        return self._data['sector']
+        return self._sector
 
     def info(self):
         if 'info' in self._data.keys():
@@ -350,6 +812,10 @@ class Security:
         else:
             return None
 
+    # Asset class percentages in ASSET_CLASSES order
+    def allocation_row(self):
+        return self.aa.amounts()
+
     def allocation_equity(self):
         return self.aa.allocation_equity()
 
@@ -368,17 +834,28 @@ class Security:
     def allocation_cash(self):
         return self.aa.allocation_cash()
 
+    # Shared read-only breakdown from the universe's BreakdownStore
+    def set_breakdown(self, brk):
+        self.brk = brk
+
     def asset_breakdown(self):
         return self.brk.asset_breakdown()
 
     def region_breakdown(self):
         return self.brk.region_breakdown()
 
+    def asset_vector(self):
+        return self.brk.asset_vector()
+
+    def region_vector(self):
+        return self.brk.region_vector()
+
+    # Percentages by underlying sector from the breakdown file, empty if it has none
+    def sector_breakdown(self):
+        return self.brk.sector_breakdown()
+
     def structure(self):
-        if 'structure' in self._data.keys():
-            return self._data['structure']
-        else:
-            return None
+        return self._structure
 
     def tdl_security(self):
         return { 'id': self.sname(),
@@ -420,13 +897,16 @@ class Security:
             detail.append({'tag': 'Annual Dividend', 'value': divi_str})
 
         # List of recent dividends if specified
-        if self.recent_divis():
-            for d in self.recent_divis():
-                tag = "%s" % (d['tag'])
-                xdate = datetime.strptime(d['ex-div'], '%Y%m%d').strftime('%d-%b-%Y')
-                pdate = datetime.strptime(d['payment'], '%Y%m%d').strftime('%d-%b-%Y')
-                if 'amount' in d.keys():
-                    value = "Ex-Dividend %s Payment %s Amount %.3f%s" % (xdate, pdate, d['amount'], d['unit'])
+        sched = self.divi_schedule()
+        if len(sched) > 0:
+            exdiv = day_numbers(sched.exdiv()).tolist()
+            payment = day_numbers(sched.payment()).tolist()
+            for n, tag in enumerate(sched.tags()):
+                tag = "%s" % (tag)
+                xdate = format_day(exdiv[n], '%d-%b-%Y')
+                pdate = format_day(payment[n], '%d-%b-%Y')
+                if not np.isnan(sched.amount()[n]):
+                    value = "Ex-Dividend %s Payment %s Amount %.3f%s" % (xdate, pdate, sched.amount()[n], unit_name(sched.unit()[n]))
                 else:
                     value = "Ex-Dividend %s Payment %s" % (xdate, pdate)
                 detail.append({'tag': tag, 'value': value})
@@ -464,6 +944,8 @@ class Security:
 
 
 class Equity(Security):
+    __slots__ = ()
+
     def __init__(self, data):
         Security.__init__(self, data)
 
@@ -471,6 +953,8 @@ class Equity(Security):
         return "%s (%s)" % (self.lname(), self.sname())
 
 class InvTrust(Security):
+    __slots__ = ()
+
     def __init__(self, data):
         Security.__init__(self, data)
 
@@ -479,18 +963,24 @@ class InvTrust(Security):
 
 
 class OEIC(Security):
+    __slots__ = ()
+
     def __init__(self, data):
         Security.__init__(self, data)
 
 
 class FP(Security):
     # Pension Fund
+    __slots__ = ()
+
     def __init__(self, data):
         Security.__init__(self, data)
         logging.debug("FP dividend_payments=%s"%(self.dividend_payments()))
 
 
 class ETF(Security):
+    __slots__ = ()
+
     def __init__(self, data):
         Security.__init__(self, data)
 
@@ -499,6 +989,8 @@ class ETF(Security):
 
 
 class ETC(Security):
+    __slots__ = ()
+
     def __init__(self, data):
         Security.__init__(self, data)
 
@@ -507,6 +999,8 @@ class ETC(Security):
 
 
 class Cash(Security):
+    __slots__ = ()
+
     def __init__(self, data):
         Security.__init__(self, data)
 
@@ -22,6 +22,9 @@ from wbformat import fmt_req_autoresize, fmt_hdr_bgcolor
 from wbformat import fmt_columns_bgcolor, fmt_columns_decimal, fmt_columns_currency
 from wbformat import RGB_GREY, RGB_BLUE, RGB_YELLOW
 
+from IncomeCalendar import income_calendar
+from Money import to_pounds
+
 
 # Apply formatting to newly created/updated sheet
 def apply_formatting(forever_income, worksheet_name):
@@ -306,60 +309,29 @@ class WsEstimatedIncome(Ws):
     #   Amount      335.09
 
     def projected_income(self, positions, secu):
-        self._projected = []
-    
-        for pos in positions:
-            acc = pos.account()
-            acc_id = "%s_%s_%s" % (acc.usercode(), pos.platform(), pos.account_type())
-
-            acctype = pos.account_type()
-            if acctype == 'Sav':
-                acctype = 'Savings'
-
-            for dp in pos.projected_dividends():
-                dt_obj = datetime.strptime(dp['payment'], "%Y%m%d")
-                tax_yend = datetime(dt_obj.year,4,5)
-                if dt_obj <= tax_yend:
-                    tax_year = dt_obj.year - 1
-                else:
-                    tax_year = dt_obj.year
-                s_tax_year = f"{tax_year}/{tax_year-2000+1}"
-
-                sec = secu.find_security(pos.sname())
-                try:
-                    freq = sec.data()['divis']['freq']
-                except:
-                    freq = ""
-
-                divi_amount = ''
-                divi_unit   = ''
-                for divi in sec.projected_dividends():
-                    if dp['payment'] == divi['payment']:
-                        divi_amount = divi['amount']
-                        divi_unit   = divi['unit']
-
-                p = {
-                    'AccountId':    acc_id,
-                    'Year':         dt_obj.year,
-                    'Month':        dt_obj.month,
-                    'Day':          dt_obj.day,
-                    'Tax Year':     s_tax_year,
-                    'Who':          acc.username(),
-                    'Type':         acctype,                    
-                    'SecurityId':   pos.sname(),
-                    'Freq':         freq,
-                    'Quantity':     pos.quantity(),
-                    'Value':        pos.value(),
-                    'Yield':        divi_amount,
-                    'Unit':         divi_unit,
-                    'Amount':       dp['amount'],
-                    'Status':       dp['type']
-                }
-            
-                self._projected.append(p)
+        cal = income_calendar(positions)
+        dates = pd.DatetimeIndex(cal['date'])
+
+        self._df = pd.DataFrame({
+            'AccountId':    cal['account'],
+            'Year':         dates.year,
+            'Month':        dates.month,
+            'Day':          dates.day,
+            'Tax Year':     cal['tax year'],
+            'Who':          cal['user'],
+            'Type':         cal['account type'].replace('Sav', 'Savings'),
+            'SecurityId':   cal['security'],
+            'Freq':         cal['freq'],
+            'Quantity':     cal['quantity'],
+            'Value':        cal['value'],
+            'Yield':        cal['yield'],
+            'Unit':         cal['unit'],
+            'Amount':       to_pounds(cal['amount'].values),
+            'Status':       cal['status']
+        })
 
         # Create dataframe of full list of positions in sorted order
-        self._df = pd.DataFrame(self._projected).sort_values(
+        self._df = self._df.sort_values(
             ['Year','Month','Day','AccountId'],ascending=[True,True,True,True]
         ).reset_index(drop=True)
 
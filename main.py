@@ -9,6 +9,7 @@ from PortfolioClasses import UserPortfolioGroup
 from AccountClasses import AccountGroup
 from PlatformClasses import AJB,II,AV
 from PlatformClasses import GSM, FSB, CSB, NW, NSI
+from Dates import format_day
 
 from wb import GspreadAuth, WbIncome, WbSecMaster
 from wb import WsSecInfo, WsSecUrls, WsByPosition
@@ -26,7 +27,7 @@ accinfo_dir = os.getenv('HOME') + '/AccountInfo'
 logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.DEBUG)
 
 # Load security universe
-secu = SecurityUniverse(secinfo_dir)
+secu = SecurityUniverse(secinfo_dir, workers=8, snapshot=secinfo_dir + '/Cache/universe.pickle', lazy=True)
 
 # Load portfolios for all user accounts
 pgrp = UserPortfolioGroup(secu, accinfo_dir)
@@ -113,14 +114,15 @@ def end_of_month_after_next(date):
 
 #------------------------------------------------------------------------------
 # Update dividend information
-# Needs a steer on which security dividend information may be stale
-# Also reproduce json security file(s) from Security Master worksheet
-
-######## TO BE DEVELOPED
+# Reproduce json security file(s) from Security Master worksheet for every
+# security with a recent dividend more than a year old, then reload them
 
 if True:
-    for SecurityId in ["LG-StratBond"]:
+    stale = secu.stale_report()
+    logging.info("stale securities:\n%s" % (stale))
+    for SecurityId in stale['sname']:
         security_update_json(SecurityId)
+    secu.refresh()
 
 #------------------------------------------------------------------------------
 # By Security - Create/Update sheet with dividends for all securities
@@ -225,14 +227,14 @@ if False:
 
             # Dividend payments in next 3m from position
             for dp in pos.projected_dividends():
-                print(f"pos-projected{dp}")
+                print(f"pos-projected{dict(dp, payment=format_day(dp['payment']))}")
             print()
 
             # Details of dividend payable for security
             sec = secu.find_security(pos.sname())
             # print(f"recent={sec.recent_divis()}")
             for dp in sec.projected_dividends():
-                print(f"sec-projected{dp}")
+                print(f"sec-projected{dict(dp, payment=format_day(dp['payment']))}")
 
             print("---sec.recent_divis()")
             print(sec.recent_divis())
@@ -0,0 +1,86 @@
+# Small household of securities and accounts written to a temporary HOME
+
+import os
+import sys
+import json
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def quarterly(amount, unit='p', year=2025):
+    return [{'tag': 'Q%d' % (n + 1), 'ex-div': '%d%02d10' % (year, m), 'payment': '%d%02d28' % (year, m), 'amount': amount, 'unit': unit}
+            for n, m in enumerate([1, 4, 7, 10])]
+
+
+SECURITIES = {
+    'TMPL': {'sname': 'TMPL', 'lname': 'Temple Bar', 'stype': 'ORD', 'alias': 'TMPL.L', 'structure': 'IT', 'sector': 'UK Equity Income',
+             'ISIN': 'GB0008825324', 'divis': {'freq': 'Q', 'prev': quarterly(3.75)}},
+    'HICL': {'sname': 'HICL', 'lname': 'HICL Infra', 'stype': 'ORD', 'alias': 'HICL.L', 'structure': 'IT', 'sector': 'Infrastructure',
+             'ISIN': 'GB00BJLP1Y77', 'divis': {'freq': 'Q', 'prev': quarterly(2.06)}},
+    'VWRL': {'sname': 'VWRL', 'lname': 'Vanguard All World', 'stype': 'ETF', 'alias': 'VWRL.L', 'structure': 'ETF', 'sector': 'Global',
+             'ISIN': 'IE00B3RBWM25', 'divis': {'freq': 'Q', 'prev': quarterly(40.0, 'c')}},
+    'LG-StratBond': {'sname': 'LG-StratBond', 'lname': 'L&G Strategic Bond', 'stype': 'Inc', 'structure': 'OEIC', 'sector': 'GBP Strategic Bond',
+                     'ISIN': 'GB00B1TWMQ97', 'SEDOL': 'B1TWMQ9', 'fund-class': 'Income', 'fund-yield': 4.5, 'divis': {'freq': 'M', 'paydate': 15}},
+    'Cash': {'sname': 'Cash', 'lname': 'Cash', 'stype': 'Cash', 'structure': 'Cash', 'sector': 'Cash', 'fund-yield': 4.0},
+}
+
+BREAKDOWNS = {
+    'TMPL': "ASSET CLASS BREAKDOWN (01/01/2025)\nRank\tAsset\tPercent\n1\tUK Equities\t90.0\n2\tCash\t10.0\n"
+            "REGION BREAKDOWN (01/01/2025)\nRank\tRegion\tPercent\n1\tUK\t95.0\n2\tUSA\t5.0\n",
+    'VWRL': "ASSET CLASS BREAKDOWN (01/01/2025)\nRank\tAsset\tPercent\n1\tGlobal Equities\t100.0\n"
+            "REGION BREAKDOWN (01/01/2025)\nRank\tRegion\tPercent\n1\tUSA\t60.0\n2\tEurope\t25.0\n3\tUK\t15.0\n",
+}
+
+ACCOUNTS = {
+    'P_AJB_ISA': 'Investment,Quantity,Price,Value (£),Cost (£)\n'
+                 '"Temple Bar (LSE:TMPL)","1,000",3.10,"3,100.00","2,000.00"\n'
+                 '"L&G (SEDOL:B1TWMQ9)","5,000",0.5,"2,500.00","2,400.00"\n'
+                 'Cash GBP,"100",1,"100.00","100.00"\n',
+    'P_II_Pens': 'Symbol,Name,Qty,Price,Market Value,Book Cost\n'
+                 'HICL.L,HICL,"3,000",£1.20,"£3,600.00","£3,900.00"\n'
+                 'VWRL.L,VW,"20",10000p,"£2,000.00","£1,800.00"\n',
+    'C_II_ISA': 'Symbol,Name,Qty,Price,Market Value,Book Cost\n'
+                'VWRL.L,VW,"100",10000p,"£10,000.00","£8,000.00"\n'
+                'TMPL.L,Temple Bar,"500",310p,"£1,550.00","£1,000.00"\n',
+}
+
+USERS = {
+    'paul': {'user': 'Paul', 'id': 'P', 'dob': '19600101', 'spDate': '20260101', 'accounts': [
+        {'acctype': 'ISA', 'platform': 'AJB', 'file': 'P_AJB_ISA_latest', 'status': 'active'},
+        {'acctype': 'Pens', 'platform': 'II', 'file': 'P_II_Pens_latest', 'status': 'active'}]},
+    'carol': {'user': 'Carol', 'id': 'C', 'dob': '19620101', 'spDate': '20280101', 'accounts': [
+        {'acctype': 'ISA', 'platform': 'II', 'file': 'C_II_ISA_latest', 'status': 'active'}]},
+}
+
+
+@pytest.fixture
+def home(tmp_path, monkeypatch):
+    for d in ['SecurityInfo/Breakdown', 'AccountInfo', 'UserData']:
+        os.makedirs(tmp_path / d)
+    for sname, defn in SECURITIES.items():
+        with open(tmp_path / 'SecurityInfo' / (sname + '.json'), 'w') as fp:
+            json.dump(defn, fp)
+    for sname, text in BREAKDOWNS.items():
+        (tmp_path / 'SecurityInfo' / 'Breakdown' / sname).write_text(text)
+    # Account summaries are dated files reached through a _latest link
+    for name, text in ACCOUNTS.items():
+        (tmp_path / 'UserData' / (name + '_20250901.csv')).write_text(text, encoding='utf-8')
+        os.symlink(name + '_20250901.csv', tmp_path / 'UserData' / (name + '_latest'))
+    for name, defn in USERS.items():
+        with open(tmp_path / 'AccountInfo' / (name + '.json'), 'w') as fp:
+            json.dump(defn, fp)
+    monkeypatch.setenv('HOME', str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def secu(home):
+    from SecurityClasses import SecurityUniverse
+    return SecurityUniverse(str(home / 'SecurityInfo'))
+
+
+@pytest.fixture
+def pgrp(home, secu):
+    from PortfolioClasses import UserPortfolioGroup
+    return UserPortfolioGroup(secu, str(home / 'AccountInfo'))
@@ -0,0 +1,28 @@
+import numpy as np
+
+from IncomeCalendar import income_calendar, tax_years
+from Dates import day_numbers
+from Money import to_pounds
+
+
+def test_calendar_matches_projected_dividends(pgrp):
+    positions = pgrp.positions()
+    expected = []
+    for pos in positions:
+        account = "%s_%s_%s" % (pos.account().usercode(), pos.platform(), pos.account_type())
+        for dp in pos.projected_dividends():
+            expected.append((account, pos.sname(), dp['payment'], dp['amount'], dp['type']))
+
+    cal = income_calendar(positions)
+    assert len(expected) > 0
+    assert list(zip(cal['account'], cal['security'], day_numbers(cal['date'].values).tolist(),
+                    to_pounds(cal['amount'].values).tolist(), cal['status'])) == expected
+
+
+def test_calendar_of_no_positions_is_empty():
+    assert len(income_calendar([])) == 0
+
+
+def test_tax_year_starts_on_6th_april():
+    dates = np.array(['2025-04-05', '2025-04-06', '2026-01-31'], dtype='datetime64[D]')
+    assert tax_years(dates).tolist() == [2024, 2025, 2025]
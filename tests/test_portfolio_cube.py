@@ -0,0 +1,61 @@
+import pytest
+
+FILTERS = [(None, None, None), ('Paul', None, None), ('Paul', 'ISA', None), ('Carol', None, None),
+           (None, ['Pens', 'ISA'], None), (None, None, 'II'), ('Nobody', None, None)]
+
+
+@pytest.mark.parametrize('user,account_type,platform_name', FILTERS)
+def test_cube_matches_position_table(pgrp, user, account_type, platform_name):
+    table = pgrp.position_table()
+    rows = table.mask(user, account_type, platform_name)
+    summary = pgrp.summary(user, account_type, platform_name)
+
+    assert summary.value_pence() == table.value_pence(rows)
+    assert summary.annual_income() == pytest.approx(table.annual_income(rows))
+    assert summary.asset_class_values() == pytest.approx(table.asset_class_values(rows))
+    sectors, parents = table.sector_rollup(rows)
+    assert list(summary.sector_rollup()[0].items()) == pytest.approx(list(sectors.items()))
+    assert list(summary.sector_rollup()[1].items()) == pytest.approx(list(parents.items()))
+
+
+def test_breakdowns_in_order_of_first_appearance(pgrp):
+    assert list(pgrp.asset_breakdown()) == ['UK Equities', 'Cash', 'Global Equities']
+    assert list(pgrp.region_breakdown('Paul')) == ['UK', 'USA', 'Europe']
+    assert pgrp.region_breakdown('Carol') == pytest.approx({'USA': 6000.0 + 77.5, 'Europe': 2500.0, 'UK': 1500.0 + 1472.5})
+
+
+def test_reload_account_replaces_only_its_cell(pgrp, secu, home):
+    with open(home / 'UserData' / 'P_AJB_ISA_20250901.csv', 'a') as fp:
+        fp.write('"HICL (LSE:HICL)","1,000",1.20,"1,200.00","1,000.00"\n')
+    carol = pgrp.get_account('Carol', 'ISA')
+    summary = carol.summary()
+    before = pgrp.value()
+
+    old = pgrp.get_account('Paul', 'ISA')
+    new = pgrp.reload_account(secu, old)
+
+    assert pgrp.get_account('Paul', 'ISA') is new
+    assert carol.summary() is summary
+    assert pgrp.value() == pytest.approx(before + 1200.0)
+    assert pgrp.value('Paul', 'ISA') == pytest.approx(new.value())
+    table = pgrp.position_table()
+    assert [pos.value() for pos in pgrp.positions()] == table.values().tolist()
+
+
+def test_reload_account_recomputes_accounts_it_reprices(home, secu):
+    from PortfolioClasses import UserPortfolioGroup
+    with open(home / 'UserData' / 'C_II_ISA_20250901.csv', 'a') as fp:
+        fp.write('LG-StratBond,L&G,"2,000",50p,"£1,000.00","£1,000.00"\n')
+    pgrp = UserPortfolioGroup(secu, str(home / 'AccountInfo'))
+    carol = pgrp.get_account('Carol', 'ISA')
+    income = pgrp.annual_income('Carol')
+
+    text = (home / 'UserData' / 'P_AJB_ISA_20250901.csv').read_text(encoding='utf-8')
+    (home / 'UserData' / 'P_AJB_ISA_20250901.csv').write_text(text.replace('"5,000",0.5,"2,500.00"', '"5,000",0.6,"3,000.00"'), encoding='utf-8')
+    pgrp.reload_account(secu, pgrp.get_account('Paul', 'ISA'))
+
+    table = pgrp.position_table()
+    rows = table.mask('Carol')
+    assert pgrp.annual_income('Carol') == pytest.approx(income + 2000 * 4.5 * 0.1 / 100.0)
+    assert pgrp.annual_income('Carol') == pytest.approx(table.annual_income(rows))
+    assert carol.annual_income() == pytest.approx(table.annual_income(rows))
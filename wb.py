@@ -16,6 +16,8 @@ from wbformat import fmt_columns_decimal, fmt_columns_percentage
 from wbformat import fmt_columns_currency, fmt_columns_hjustify
 from wbformat import RGB_GREY
 
+from Dates import format_day
+
 
 # Worksheets used as source information
 WS_HL_DIVIDENDS     = "hl"             # Hargreaves Lansdown dividend information
@@ -94,29 +96,8 @@ class WsSecInfo(Ws):
             'div-freq'
         ]
     
-        # Ignore these columns from json security files
-        entries_to_remove = [
-            'info', 'divis','mdate',
-            'fund-yield',
-            'annual-income',
-            'asset-allocation'
-        ]
-
-        # Read json files and create one row for each
-        lst = []
-        for sec in secu.securities():
-            defn = secu.find_security(sec).data()
-            try:
-                freq = defn['divis']['freq']
-            except:
-                freq = None
-            for k in entries_to_remove:
-                defn.pop(k, None)
-            defn['div-freq'] = freq
-            lst.append(defn)
-
         # Convert to dataframe with NaN replaced with None and all columns 'str'
-        df = pd.DataFrame(lst)[sec_info_cols].astype(str).sort_values('sname')
+        df = secu.table()[sec_info_cols].astype(str).sort_values('sname')
         df = df.replace({'None':None, 'nan':None})
 
         return df
@@ -176,25 +157,8 @@ class WsSecUrls(Ws):
     # Url           E.g. Link to Hargreaves Lansdown detailed information
 
     def create_security_urls(self,secu):
-        urls = []
         # Each security may have none, one or more URLs associated
-        for sec in secu.securities():
-            defn = secu.find_security(sec).data()
-            try:
-                info = defn['info']
-            except:
-                info = None
-
-            if info is not None:
-                for platform in info.keys():
-                    urls.append({
-                        'SecurityId':   defn['sname'],
-                        'Platform':     platform,
-                        'Url':          info[platform]
-                    })
-
-        # Convert to dataframe with all columns 'str'
-        df = pd.DataFrame(urls)[['SecurityId','Platform','Url']].astype(str)
+        df = secu.url_table().astype(str)
         df = df.sort_values(['SecurityId','Platform'])
 
         return df
@@ -276,7 +240,7 @@ class WsByPosition(Ws):
                 'Quantity':     pos.quantity(),
                 'BookCost':     pos.cost(),
                 'Value':        pos.value(),
-                'ValueDate':    pos.vdate()
+                'ValueDate':    format_day(pos.vdate())
             }
             
             logging.debug("position_info(p=%s)", p)